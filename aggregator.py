@@ -0,0 +1,126 @@
+from collections import Counter
+
+from countries import normalize_country_counts
+from sketches import HyperLogLog
+from user_agent_parser import describe_user_agent, format_bot_stats, format_user_agent_stats
+from waf_analytics import WafAggregator
+
+# 计入浏览器、Bot 与国家统计的正常响应状态码，WAF 拦截的响应不在其中
+COUNTED_RESPONSE_STATUSES = (200, 201, 202, 204, 206, 301, 302, 304, 307, 308)
+# 浏览器主版本排行保留的条目数
+TOP_BROWSER_VERSIONS = 10
+
+
+class HourlyAggregator:
+    """逐条接收事件，一次遍历同时得到浏览器、Bot、国家与 WAF 的统计。
+
+    事件可以是原始事件，也可以是服务端聚合后带 count 的分组行；
+    分组行只包含参与分组的字段，缺失的维度不参与对应的统计。
+    多个聚合器可以通过 merge 合并，用于把若干小时汇总为更长的窗口。
+    国家按原始值计数，只在输出时对去重后的键做一次归一化。
+    WAF 事件交由 WafAggregator 按动作、国家、规则统计。
+    独立访客（clientIP）与不同 UA 的数量用 HyperLogLog 估计，内存固定，
+    草图状态写入记录的 sketches 字段，日、月汇总直接合并草图得到去重数。
+    UA 解析一次同时得到浏览器主版本、操作系统与设备类型，分别计数。
+    """
+
+    def __init__(self):
+        self.browsers = Counter()
+        self.bots = Counter()
+        self.countries = Counter()
+        self.browser_versions = Counter()
+        self.operating_systems = Counter()
+        self.devices = Counter()
+        self.waf = WafAggregator()
+        self.visitors = HyperLogLog()
+        self.user_agents = HyperLogLog()
+
+    @classmethod
+    def from_record(cls, record):
+        """从已输出的小时（或汇总）记录恢复计数，用于把多条记录合并为更长的窗口。"""
+        aggregator = cls()
+        for item in record.get("top_user_agents", []):
+            aggregator.browsers[item["browser"]] += item["requests"]
+        for item in record.get("top_bots", []):
+            aggregator.bots[item["name"]] += item["requests"]
+        for item in record.get("top_countries", []):
+            aggregator.countries[item["country"]] += item["requests"]
+        for item in record.get("top_browser_versions", []):
+            aggregator.browser_versions[item["browser"]] += item["requests"]
+        for item in record.get("top_operating_systems", []):
+            aggregator.operating_systems[item["os"]] += item["requests"]
+        for item in record.get("device_types", []):
+            aggregator.devices[item["device"]] += item["requests"]
+        aggregator.waf = WafAggregator.from_record(record)
+        sketches = record.get("sketches") or {}
+        if "visitors" in sketches:
+            aggregator.visitors = HyperLogLog.from_state(sketches["visitors"])
+        if "user_agents" in sketches:
+            aggregator.user_agents = HyperLogLog.from_state(sketches["user_agents"])
+        return aggregator
+
+    def add_request(self, event):
+        """累计一条正常响应的请求（或一个请求分组）。"""
+        weight = event.get("count", 1)
+        if "userAgent" in event:
+            ua = event["userAgent"]
+            if ua and ua.strip() != "":
+                info = describe_user_agent(ua)
+                self.browsers[info.browser] += weight
+                if info.bot:
+                    self.bots[info.bot] += weight
+                elif info.version:
+                    self.browser_versions[f"{info.browser} {info.version}"] += weight
+                self.operating_systems[info.os] += weight
+                self.devices[info.device] += weight
+                self.user_agents.add(ua)
+        if "clientCountryName" in event:
+            self.countries[event["clientCountryName"]] += weight
+        if event.get("clientIP"):
+            self.visitors.add(event["clientIP"])
+
+    def add_waf_event(self, event):
+        """累计一条 WAF 缓解事件（或一个事件分组）。"""
+        self.waf.add_event(event)
+
+    def merge(self, other):
+        self.browsers.update(other.browsers)
+        self.bots.update(other.bots)
+        self.countries.update(other.countries)
+        self.browser_versions.update(other.browser_versions)
+        self.operating_systems.update(other.operating_systems)
+        self.devices.update(other.devices)
+        self.waf.merge(other.waf)
+        self.visitors.merge(other.visitors)
+        self.user_agents.merge(other.user_agents)
+        return self
+
+    def results(self):
+        """返回与小时记录字段一致的统计结果。"""
+        return {
+            **self.waf.results(),
+            # 浏览器图表保留前 10 项，Bot 表格使用单独的完整分类结果。
+            "top_user_agents": format_user_agent_stats(self.browsers),
+            "top_bots": format_bot_stats(self.bots),
+            "top_countries": [
+                {"country": country, "requests": count}
+                for country, count in Counter(normalize_country_counts(self.countries)).most_common()
+            ],
+            "top_browser_versions": [
+                {"browser": browser, "requests": count}
+                for browser, count in self.browser_versions.most_common(TOP_BROWSER_VERSIONS)
+            ],
+            "top_operating_systems": [
+                {"os": name, "requests": count} for name, count in self.operating_systems.most_common()
+            ],
+            "device_types": [
+                {"device": device, "requests": count} for device, count in self.devices.most_common()
+            ],
+            # 对应维度未采集时为 None
+            "unique_visitors": self.visitors.count() if self.visitors else None,
+            "unique_user_agents": self.user_agents.count() if self.user_agents else None,
+            "sketches": {
+                **({"visitors": self.visitors.to_state()} if self.visitors else {}),
+                **({"user_agents": self.user_agents.to_state()} if self.user_agents else {}),
+            },
+        }
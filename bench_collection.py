@@ -0,0 +1,141 @@
+"""在本地模拟 GraphQL 服务上端到端运行 get.py，测量不同配置下的采集性能。
+
+每个配置在独立的临时目录中运行 get.py 子进程，记录墙钟时间、请求数、
+错误数、返回的事件数、事件吞吐量以及子进程的峰值内存。--runs 大于 1 时
+后续运行复用同一目录，用于测量增量采集。
+
+用法: python bench_collection.py --concurrency 1,4,8 --batch-hours 1,6 --events-per-hour 2000
+"""
+import argparse
+import itertools
+import json
+import os
+import resource
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_graphql_server import MockGraphQLServer
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def int_list(value):
+    return [int(item) for item in value.split(",") if item]
+
+
+def run_child(use_tracemalloc):
+    """在子进程中执行 get.py，最后一行输出峰值内存。"""
+    if use_tracemalloc:
+        import tracemalloc
+        tracemalloc.start()
+    runpy.run_path(os.path.join(REPO_DIR, "get.py"), run_name="__main__")
+    result = {"peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    if use_tracemalloc:
+        result["peak_heap_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+    print(json.dumps(result))
+
+
+def run_collection(server, workdir, env, use_tracemalloc):
+    """运行一次 get.py，返回本次的测量结果。"""
+    before = server.stats.copy()
+    command = [sys.executable, os.path.abspath(__file__), "--child"]
+    if use_tracemalloc:
+        command.append("--tracemalloc")
+    started = time.perf_counter()
+    completed = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"get.py 运行失败:\n{completed.stdout[-2000:]}\n{completed.stderr[-2000:]}")
+
+    memory = json.loads(completed.stdout.strip().splitlines()[-1])
+    requests = server.stats["requests"] - before["requests"]
+    events = server.stats["events"] - before["events"]
+    return {
+        "wall_seconds": round(wall, 3),
+        "requests": requests,
+        "errors": server.stats["errors"] - before["errors"],
+        "events": events,
+        "events_per_second": round(events / wall) if wall else 0,
+        **memory,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="get.py 端到端采集压测")
+    parser.add_argument("--concurrency", type=int_list, default=[4], help="GRAPHQL_CONCURRENCY，逗号分隔")
+    parser.add_argument("--batch-hours", type=int_list, default=[6], help="BATCH_HOURS，逗号分隔")
+    parser.add_argument("--max-pages", type=int_list, default=[20], help="MAX_PAGES，逗号分隔")
+    parser.add_argument("--mode", default="events", help="AGGREGATION_MODE，逗号分隔")
+    parser.add_argument("--zones", type=int, default=1, help="模拟的 Zone 数量")
+    parser.add_argument("--hours", type=int, default=24, help="RETENTION_HOURS")
+    parser.add_argument("--runs", type=int, default=1, help="每个配置在同一目录中连续运行的次数")
+    parser.add_argument("--events-per-hour", type=int, default=2000)
+    parser.add_argument("--waf-events-per-hour", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟服务每个响应的固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--ua-variety", type=int, default=200)
+    parser.add_argument("--tracemalloc", action="store_true", help="额外记录 Python 堆峰值（会明显变慢）")
+    parser.add_argument("--json", help="把每次运行的结果追加写入此 JSON Lines 文件")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args.tracemalloc)
+
+    server = MockGraphQLServer(
+        events_per_hour=args.events_per_hour,
+        waf_events_per_hour=args.waf_events_per_hour,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        ua_variety=args.ua_variety,
+    )
+    zone_ids = ",".join(f"zone{index:02d}" for index in range(args.zones))
+    configs = itertools.product(args.mode.split(","), args.concurrency, args.batch_hours, args.max_pages)
+
+    print(f"{'模式':<8}{'并发':>5}{'批量':>5}{'页数':>5}{'运行':>5}{'耗时(s)':>10}{'请求':>7}{'错误':>6}{'事件':>10}{'事件/s':>10}{'峰值内存(MB)':>14}")
+    with server:
+        for mode, concurrency, batch_hours, max_pages in configs:
+            config = {
+                "mode": mode,
+                "concurrency": concurrency,
+                "batch_hours": batch_hours,
+                "max_pages": max_pages,
+                "zones": args.zones,
+                "hours": args.hours,
+                "events_per_hour": args.events_per_hour,
+                "latency": args.latency,
+                "error_rate": args.error_rate,
+            }
+            env = {
+                **os.environ,
+                "CLOUDFLARE_API_TOKEN": "mock",
+                "ZONE_ID": zone_ids,
+                "GRAPHQL_URL": server.url,
+                "GRAPHQL_RATE_LIMIT": "0",
+                "GRAPHQL_CONCURRENCY": str(concurrency),
+                "BATCH_HOURS": str(batch_hours),
+                "MAX_PAGES": str(max_pages),
+                "AGGREGATION_MODE": mode,
+                "RETENTION_HOURS": str(args.hours),
+            }
+            with tempfile.TemporaryDirectory() as workdir:
+                for run in range(1, args.runs + 1):
+                    result = run_collection(server, workdir, env, args.tracemalloc)
+                    print(
+                        f"{mode:<8}{concurrency:>5}{batch_hours:>5}{max_pages:>5}{run:>5}"
+                        f"{result['wall_seconds']:>10.2f}{result['requests']:>7}{result['errors']:>6}"
+                        f"{result['events']:>10}{result['events_per_second']:>10}"
+                        f"{result['peak_rss_kb'] / 1024:>14.1f}"
+                    )
+                    if args.json:
+                        with open(args.json, "a", encoding="utf-8") as f:
+                            f.write(json.dumps({**config, "run": run, **result}, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
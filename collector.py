@@ -0,0 +1,773 @@
+"""可导入、可重复调用的采集器：按小时增量获取 Cloudflare 统计并写入输出。
+
+Collector 只在第一次运行时创建 GraphQL 客户端（导入 requests、建立连接池），
+之后的运行复用同一连接和内存中的上次结果；常驻进程可以反复调用 run()，
+不必每小时重新启动解释器、导入依赖和建立 TLS 连接。get.py 是基于环境变量的命令行入口。
+
+    with Collector(api_token, zone_ids=["..."], retention_hours=24) as collector:
+        record = collector.run()
+"""
+from collections import deque
+from datetime import datetime, timedelta, timezone
+import os
+import json
+import time
+from aggregator import COUNTED_RESPONSE_STATUSES, HourlyAggregator
+from dashboard_output import write_dashboard
+from graphql_client import GRAPHQL_URL, EventStream, GraphQLClient, GraphQLRequestError, zone_result
+from history_store import HISTORY_VIEWS, HistoryStore, load_existing_records, merge_records, settled_records
+from run_metrics import PROFILE_MODES, RunMetrics, append_jsonl, summarize_queries
+from traffic_metrics import (
+    MINUTE_QUERY_HOURS,
+    ORIGIN_PERCENTILES,
+    busiest_minute_rps,
+    hourly_traffic,
+    merge_zone_minutes,
+    minute_requests_by_hour,
+    origin_percentiles_by_hour,
+    traffic_fields,
+)
+from user_agent_parser import ua_cache_stats
+from waf_analytics import WAF_PAGE_SIZE, summarize_records, waf_events_block, waf_groups_block
+
+OUTPUT_FILE = "cloudflare_hourly_stats.json"
+HISTORY_DB = "cloudflare_history.sqlite3"
+# 多个 Zone 时，各 Zone 的输出写入此目录下以 Zone ID 命名的子目录
+ZONES_DIR = "zones"
+METRICS_FILE = "cloudflare_run_metrics.jsonl"
+PROFILE_FILE = "cloudflare_run.prof"
+UA_PAGE_SIZE = 5000
+GROUP_LIMIT = 10000
+
+# 一次查询整个时间窗口，按 datetime 维度拆分为每小时一组
+traffic_query = """
+query GetZoneAnalytics($zoneTag: String!, $since: DateTime!, $until: DateTime!, $limit: Int!) {
+  viewer {
+    zones(filter: { zoneTag: $zoneTag }) {
+      httpRequests1hGroups(
+        limit: $limit,
+        filter: { datetime_geq: $since, datetime_lt: $until },
+        orderBy: [datetime_ASC]
+      ) {
+        dimensions {
+          datetime
+        }
+        sum {
+          requests
+          bytes
+          cachedRequests
+          cachedBytes
+          responseStatusMap {
+            edgeResponseStatus
+            requests
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+# 每小时的峰值每秒请求数（由分钟粒度数据得到）与回源耗时分位数；
+# 单独查询，套餐不支持时不影响主流量数据
+traffic_details_query = """
+query GetTrafficDetails($zoneTag: String!, $since: DateTime!, $until: DateTime!, $minuteLimit: Int!, $hourLimit: Int!) {
+  viewer {
+    zones(filter: { zoneTag: $zoneTag }) {
+      minutes: httpRequests1mGroups(
+        limit: $minuteLimit,
+        filter: { datetime_geq: $since, datetime_lt: $until },
+        orderBy: [datetimeMinute_ASC]
+      ) {
+        dimensions {
+          datetimeMinute
+        }
+        sum {
+          requests
+        }
+      }
+      origin: httpRequestsAdaptiveGroups(
+        limit: $hourLimit,
+        filter: { datetime_geq: $since, datetime_lt: $until, originResponseDurationMs_gt: 0 },
+        orderBy: [datetimeHour_ASC]
+      ) {
+        dimensions {
+          datetimeHour
+        }
+        quantiles {
+          {percentiles}
+        }
+      }
+    }
+  }
+}
+""".replace("{percentiles}", "\n          ".join(ORIGIN_PERCENTILES))
+
+normal_requests_block = """
+      {dataset}_{index}: httpRequestsAdaptive(
+        limit: {limit},
+        orderBy: [datetime_ASC],
+        filter: {{
+          datetime_geq: $since{index},
+          datetime_lt: $until{index},
+          edgeResponseStatus_in: {statuses}
+        }}
+      ) {{
+        userAgent
+        clientCountryName
+        clientIP
+        datetime
+        edgeResponseStatus
+      }}""".replace("{statuses}", json.dumps(list(COUNTED_RESPONSE_STATUSES)))
+
+
+# 按单一维度分组，使 UA 分类只对去重后的字符串执行一次
+normal_requests_groups_block = """
+      {dataset}_{index}: httpRequestsAdaptiveGroups(
+        limit: {limit},
+        orderBy: [count_DESC],
+        filter: {{
+          datetime_geq: $since{index},
+          datetime_lt: $until{index},
+          edgeResponseStatus_in: {statuses}
+        }}
+      ) {{
+        count
+        dimensions {{
+          {dimension}
+        }}
+      }}""".replace("{statuses}", json.dumps(list(COUNTED_RESPONSE_STATUSES)))
+
+EVENT_BLOCKS = {
+    "waf": (waf_events_block, WAF_PAGE_SIZE),
+    "ua": (normal_requests_block, UA_PAGE_SIZE),
+    "waf_groups": (waf_groups_block, GROUP_LIMIT),
+    "ua_groups": (normal_requests_groups_block.replace("{dimension}", "userAgent"), GROUP_LIMIT),
+    "country_groups": (normal_requests_groups_block.replace("{dimension}", "clientCountryName"), GROUP_LIMIT),
+}
+
+MODE_DATASETS = {
+    "events": ("waf", "ua"),
+    "groups": ("waf_groups", "ua_groups", "country_groups"),
+}
+
+
+def build_events_query(hour_count, datasets):
+    """用 GraphQL 别名把多个小时的 WAF 与 UA 查询合并为一个请求。"""
+    params = ", ".join(
+        f"$since{index}: DateTime!, $until{index}: DateTime!"
+        for index in range(hour_count)
+    )
+    blocks = "".join(
+        EVENT_BLOCKS[dataset][0].format(dataset=dataset, index=index, limit=EVENT_BLOCKS[dataset][1])
+        for index in range(hour_count)
+        for dataset in datasets
+    )
+    return (
+        f"query GetHourlyEvents($zoneTag: String!, {params}) {{\n"
+        "  viewer {\n"
+        "    zones(filter: { zoneTag: $zoneTag }) {"
+        f"{blocks}\n"
+        "    }\n"
+        "  }\n"
+        "}\n"
+    )
+
+
+def format_datetime(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+
+class HourlyEventStream(EventStream):
+    """某一小时某个数据集的事件流：首页来自批量查询，后续页按游标单独请求。"""
+
+    def __init__(self, collector, zone_id, dataset, first_page, since_time, until_time):
+        super().__init__(first_page, self.fetch_dataset_page, EVENT_BLOCKS[dataset][1], collector.max_pages)
+        self.collector = collector
+        self.zone_id = zone_id
+        self.dataset = dataset
+        self.since_time = since_time
+        self.until_time = until_time
+
+    def fetch_dataset_page(self, cursor):
+        with self.collector.metrics.stage("page_fetch"):
+            data = self.collector.client.fetch(build_events_query(1, [self.dataset]), {
+                "zoneTag": self.zone_id,
+                "since0": cursor,
+                "until0": format_datetime(self.until_time)
+            })
+        return zone_result(data, f"{self.dataset}_0")[f"{self.dataset}_0"]
+
+
+class GroupedRowStream:
+    """遍历服务端聚合结果，把每个分组展开为带 count 权重的行。
+
+    分组查询按计数降序返回，没有可用的游标；返回条数达到上限时标记为截断。
+    """
+
+    def __init__(self, *groups):
+        self.groups = groups
+        self.truncated = any(len(rows) >= GROUP_LIMIT for rows in groups)
+
+    def __iter__(self):
+        for rows in self.groups:
+            for row in rows:
+                yield {**row["dimensions"], "count": row["count"]}
+
+
+def build_hour_record(since_time, until_time, traffic, firewall_events, user_agent_events):
+    """根据某一小时的流量字段（traffic_fields 的结果）与事件生成单小时统计记录。"""
+
+    aggregator = HourlyAggregator()
+    try:
+        # 事件流只能遍历一次，所有维度在同一轮循环中统计
+        for event in firewall_events:
+            aggregator.add_waf_event(event)
+        # User-Agent统计（仅获取正常响应的请求，排除WAF拦截）
+        for event in user_agent_events:
+            aggregator.add_request(event)
+    except GraphQLRequestError:
+        # 翻页请求失败时整小时作废，交由调用方标记为失败
+        raise
+    except Exception as e:
+        print(f"\n获取数据时出错: {e}")
+        aggregator = HourlyAggregator()
+
+    return {
+        "since": int(since_time.timestamp()),
+        "until": int(until_time.timestamp()),
+        **traffic,
+        **aggregator.results(),
+        "waf_truncated": firewall_events.truncated,
+        "user_agents_truncated": user_agent_events.truncated
+    }
+
+
+class ZoneCollection:
+    """单个 Zone 的一次增量采集：先提交流量查询，事件批次由 BatchQueue 按顺序提交与收集。
+
+    已定稿的小时直接复用上次的结果，只获取缺失、仍可能变化或上次失败的小时。
+    某个查询最终失败时只影响它覆盖的小时：这些小时保留上次的结果并标记
+    failed，下一次运行会重新获取，其余小时照常输出。
+    """
+
+    def __init__(self, collector, zone_id, output_dir, hours, now, existing):
+        self.collector = collector
+        self.zone_id = zone_id
+        self.output_dir = output_dir
+        self.fetched = []
+        self.failed = []
+        self.batches = []
+        # 本次获取的小时的分钟请求数，只用于计算账户级峰值，不写入记录
+        self.minute_requests = {}
+        self.existing = existing
+        self.records = settled_records(existing, hours, now, collector.refetch_hours)
+        self.missing_hours = [
+            (since_time, until_time)
+            for since_time, until_time in hours
+            if int(since_time.timestamp()) not in self.records
+        ]
+
+    def window_variables(self, window_since, window_until):
+        return {
+            "zoneTag": self.zone_id,
+            "since": format_datetime(window_since),
+            "until": format_datetime(window_until),
+        }
+
+    def submit(self):
+        """把流量查询提交到共享的线程池，并把缺失的小时划分为事件批次。"""
+        if not self.missing_hours:
+            return
+        client = self.collector.client
+        batch_hours = self.collector.batch_hours
+        self.batches = [
+            self.missing_hours[start:start + batch_hours]
+            for start in range(0, len(self.missing_hours), batch_hours)
+        ]
+        window_since, window_until = self.missing_hours[0][0], self.missing_hours[-1][1]
+        window_hours = int((window_until - window_since).total_seconds() // 3600)
+        variables = self.window_variables(window_since, window_until)
+        self.traffic_future = client.submit(traffic_query, {**variables, "limit": window_hours})
+        # 分钟分组每个查询最多 10000 个，较长的窗口拆分为多个查询
+        self.details_futures = []
+        chunk_since = window_since
+        while chunk_since < window_until:
+            chunk_until = min(chunk_since + timedelta(hours=MINUTE_QUERY_HOURS), window_until)
+            chunk_hours = int((chunk_until - chunk_since).total_seconds() // 3600)
+            self.details_futures.append(((chunk_since, chunk_until), client.submit(traffic_details_query, {
+                **self.window_variables(chunk_since, chunk_until),
+                "minuteLimit": chunk_hours * 60,
+                "hourLimit": chunk_hours
+            })))
+            chunk_since = chunk_until
+
+    def submit_hourly_events(self, hours):
+        variables = {"zoneTag": self.zone_id}
+        for index, (since_time, until_time) in enumerate(hours):
+            variables[f"since{index}"] = format_datetime(since_time)
+            variables[f"until{index}"] = format_datetime(until_time)
+        query = build_events_query(len(hours), MODE_DATASETS[self.collector.mode])
+        return self.collector.client.submit(query, variables)
+
+    def collect_traffic(self):
+        """解析整个窗口的流量数据，返回 {小时起始时间戳: 流量字段}；响应有错误时抛出 GraphQLRequestError。"""
+        with self.collector.metrics.stage("wait"):
+            traffic_data = self.traffic_future.result()
+        zone = zone_result(traffic_data, "httpRequests1hGroups")
+        try:
+            return hourly_traffic(zone["httpRequests1hGroups"])
+        except (KeyError, TypeError, ValueError) as e:
+            raise GraphQLRequestError(f"流量数据格式错误: {e}") from e
+
+    def collect_traffic_details(self):
+        """解析分钟请求数与回源耗时，返回 ({小时: [60 个分钟的请求数]}, {小时: [P50, P95, P99]})。
+
+        这些数据是可选的：某个查询失败或套餐不支持时，对应小时不出现在结果中。
+        """
+        minutes, origin = {}, {}
+        for (since_time, until_time), future in self.details_futures:
+            try:
+                with self.collector.metrics.stage("wait"):
+                    data = future.result()
+                zone = (((data.get("data") or {}).get("viewer") or {}).get("zones") or [{}])[0] or {}
+                if data.get("errors"):
+                    print(f"\n峰值或回源耗时数据不完整: {data['errors']}")
+                if isinstance(zone.get("minutes"), list):
+                    hours = range(int(since_time.timestamp()), int(until_time.timestamp()), 3600)
+                    minutes.update(minute_requests_by_hour(zone["minutes"], hours))
+                origin.update(origin_percentiles_by_hour(zone.get("origin") or []))
+            except Exception as e:
+                print(f"\n获取峰值与回源耗时数据时出错: {e}")
+        return minutes, origin
+
+    def collect_hourly_events(self, future, hours):
+        """解析批量获取的 WAF 与 UA 事件，按小时拆分为 (WAF事件流, UA事件流) 列表。
+
+        响应带有错误或缺少任一小时的数据集时抛出 GraphQLRequestError，整批小时标记为失败。
+        """
+        with self.collector.metrics.stage("wait"):
+            events_data = future.result()
+
+        datasets = MODE_DATASETS[self.collector.mode]
+        zone = zone_result(events_data, *(f"{dataset}_{index}" for index in range(len(hours)) for dataset in datasets))
+        if self.collector.mode == "groups":
+            return [
+                (
+                    GroupedRowStream(zone[f"waf_groups_{index}"]),
+                    GroupedRowStream(zone[f"ua_groups_{index}"], zone[f"country_groups_{index}"]),
+                )
+                for index in range(len(hours))
+            ]
+        return [
+            (
+                HourlyEventStream(self.collector, self.zone_id, "waf", zone[f"waf_{index}"], since_time, until_time),
+                HourlyEventStream(self.collector, self.zone_id, "ua", zone[f"ua_{index}"], since_time, until_time),
+            )
+            for index, (since_time, until_time) in enumerate(hours)
+        ]
+
+    def mark_failed(self, hours, error):
+        print(f"\n{self.zone_id}: {len(hours)} 小时获取失败，将在下次运行时重试: {error}")
+        for since_time, _ in hours:
+            since_ts = int(since_time.timestamp())
+            self.failed.append(since_ts)
+            if since_ts in self.existing:
+                self.records[since_ts] = {**self.existing[since_ts], "failed": True}
+
+    def collect(self, queue, on_batch):
+        """从 queue 依次取出本 Zone 各批次的结果并生成小时记录，每完成一批调用 on_batch(小时数)。"""
+        if not self.missing_hours:
+            return
+        # 除 GraphQLRequestError 外，任何意外错误也只让对应的小时失败，不中断整次运行
+        try:
+            traffic_by_hour = self.collect_traffic()
+            traffic_error = None
+        except Exception as e:
+            traffic_by_hour, traffic_error = {}, e
+        minutes, origin = self.collect_traffic_details()
+
+        for batch in self.batches:
+            future = queue.next()
+            try:
+                if traffic_error:
+                    raise traffic_error
+                streams = self.collect_hourly_events(future, batch)
+            except Exception as e:
+                self.mark_failed(batch, e)
+                on_batch(len(batch))
+                continue
+
+            for (since_time, until_time), (firewall_events, user_agent_events) in zip(batch, streams):
+                since_ts = int(since_time.timestamp())
+                minute_requests = minutes.get(since_ts)
+                self.minute_requests[since_ts] = minute_requests
+                traffic = traffic_fields(traffic_by_hour.get(since_ts, {}), busiest_minute_rps(minute_requests), origin.get(since_ts))
+                try:
+                    with self.collector.metrics.stage("aggregate"):
+                        self.records[since_ts] = build_hour_record(since_time, until_time, traffic, firewall_events, user_agent_events)
+                except GraphQLRequestError as e:
+                    self.mark_failed([(since_time, until_time)], e)
+                    continue
+                self.fetched.append(self.records[since_ts])
+            on_batch(len(batch))
+
+    def results(self):
+        return [self.records[since_ts] for since_ts in sorted(self.records)]
+
+
+class BatchQueue:
+    """按收集顺序提交各 Zone 的事件批次，同时在途（已提交未取出）的批次不超过 limit 个。
+
+    每个批次的首页最多有 batch_hours × (WAF_PAGE_SIZE + UA_PAGE_SIZE) 行，一次性提交全部批次时
+    所有首页会同时留在内存中；限制在途数量并在取出后丢弃 Future，内存只与并发数有关。
+    """
+
+    def __init__(self, collections, limit):
+        self.jobs = ((collection, batch) for collection in collections for batch in collection.batches)
+        self.pending = deque()
+        self.limit = max(1, limit)
+        self.fill()
+
+    def fill(self):
+        while len(self.pending) < self.limit:
+            job = next(self.jobs, None)
+            if job is None:
+                return
+            collection, batch = job
+            self.pending.append(collection.submit_hourly_events(batch))
+
+    def next(self):
+        """取出下一个批次的 Future，并补充提交后续批次。"""
+        future = self.pending.popleft()
+        self.fill()
+        return future
+
+
+def write_state(output_dir, results, fetched, now, generated_at):
+    """写入增量状态文件，作为下一次（新进程中）运行的输入。"""
+    output_file = os.path.join(output_dir, OUTPUT_FILE)
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, separators=(",", ":"))
+    print(f"数据已保存到 {output_file}")
+
+
+def write_hourly_dashboard(output_dir, results, fetched, now, generated_at):
+    """看板文件：概览与明细分开写入，并附带预压缩版本。"""
+    for dashboard_file in write_dashboard(os.path.join(output_dir, "cloudflare_hourly"), results, generated_at):
+        print(f"看板数据已导出到 {dashboard_file}")
+
+
+class HistorySink:
+    """写入长期历史，并导出看板可选择的时间范围；数据库位于各输出目录下的 filename。"""
+
+    def __init__(self, filename=HISTORY_DB):
+        self.filename = filename
+
+    def __call__(self, output_dir, results, fetched, now, generated_at):
+        path = os.path.join(output_dir, self.filename)
+        # 新建数据库时导入状态文件中已有的全部小时，而不只是本次获取的小时
+        records = fetched if os.path.exists(path) else [record for record in results if not record.get("failed")]
+        with HistoryStore(path) as store:
+            store.add_hours(records)
+            for name in HISTORY_VIEWS:
+                prefix = os.path.join(output_dir, f"cloudflare_history_{name}")
+                for dashboard_file in write_dashboard(prefix, store.view(name, int(now.timestamp())), generated_at):
+                    print(f"历史数据已导出到 {dashboard_file}")
+
+
+def merge_zone_records(collections, previous=None):
+    """把各 Zone 同一小时的记录合并为账户级记录，返回 (全部记录, 本次有更新的记录)。
+
+    任一 Zone 这一小时获取失败时，账户级记录标记为 failed。峰值由本次获取的分钟请求数
+    逐分钟相加得到；各 Zone 都复用已定稿记录的小时沿用 previous（上次的账户级记录）中的峰值，
+    其余缺少分钟数据的小时峰值为 None。
+    """
+    previous = previous or {}
+    merged = {}
+    fetched_hours = {record["since"] for collection in collections for record in collection.fetched}
+    all_hours = sorted({since_ts for collection in collections for since_ts in collection.records})
+    for since_ts in all_hours:
+        zone_records = [
+            collection.records[since_ts]
+            for collection in collections
+            if since_ts in collection.records
+        ]
+        merged[since_ts] = merge_records(zone_records, since_ts, zone_records[0]["until"])
+        # 各 Zone 的峰值可能出现在不同分钟，账户级峰值由逐分钟相加的请求数得到
+        if since_ts in fetched_hours:
+            minute_requests = merge_zone_minutes([collection.minute_requests.get(since_ts) for collection in collections])
+            merged[since_ts]["peak_rps"] = busiest_minute_rps(minute_requests)
+        else:
+            merged[since_ts]["peak_rps"] = previous.get(since_ts, {}).get("peak_rps")
+        # 某个 Zone 这一小时失败（即使没有可保留的旧记录）时，账户级记录不完整
+        if any(record.get("failed") for record in zone_records) or any(
+            since_ts in collection.failed for collection in collections
+        ):
+            merged[since_ts]["failed"] = True
+    results = [merged[since_ts] for since_ts in all_hours]
+    return results, [merged[since_ts] for since_ts in sorted(fetched_hours)]
+
+
+def print_progress(progress, total_hours):
+    # 打印进度条
+    percent = (progress / total_hours) * 100
+    bar_length = 30
+    filled_length = int(bar_length * progress // total_hours)
+    bar = '█' * filled_length + '-' * (bar_length - filled_length)
+    print(f"\r进度: |{bar}| {percent:.1f}% ({progress}/{total_hours} 小时)", end="", flush=True)
+
+
+class ConfigError(ValueError):
+    """配置错误（缺少或无效的环境变量、无法列出或没有 Zone），命令行入口据此给出提示并退出。"""
+
+
+def env_number(name, default, kind=int, minimum=None):
+    """读取数值环境变量，无法解析时抛出 ConfigError；给出 minimum 时结果不小于它。"""
+    value = os.getenv(name, default)
+    try:
+        number = kind(value)
+    except ValueError:
+        raise ConfigError(f"环境变量 {name} 不是有效的数字: {value}") from None
+    return number if minimum is None else max(minimum, number)
+
+
+def env_settings():
+    """读取 get.py 使用的环境变量（及 .env 文件），返回 Collector 的参数。
+
+    waf.py 与 watch.py 使用同一份配置，没有缺失的小时时可以不创建采集器（不需要 API Token）。
+    数值无效时抛出 ConfigError。
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+    return {
+        "api_token": os.getenv('CLOUDFLARE_API_TOKEN'),
+        # 可用逗号分隔多个 Zone；只设置 ACCOUNT_ID 时自动获取账户下的全部 Zone
+        "zone_ids": [zone_id.strip() for zone_id in os.getenv('ZONE_ID', '').split(',') if zone_id.strip()],
+        "account_id": os.getenv('ACCOUNT_ID'),
+        # 输出文件保留的小时数，更早的记录会被淘汰
+        "retention_hours": env_number('RETENTION_HOURS', '24'),
+        # 最近若干小时的数据可能仍在补齐，即使已存在也重新获取
+        "refetch_hours": env_number('REFETCH_HOURS', '2'),
+        # 每个批量请求覆盖的小时数，设为 1 时退化为逐小时请求
+        "batch_hours": env_number('BATCH_HOURS', '6'),
+        # 同时进行中的 GraphQL 请求数上限，所有 Zone 共享
+        "concurrency": env_number('GRAPHQL_CONCURRENCY', '4'),
+        # 单个查询可恢复错误（网络、429、5xx、GraphQL 限流）的最多重试次数
+        "max_retries": env_number('GRAPHQL_MAX_RETRIES', '4'),
+        # 每秒最多发出的 GraphQL 查询数，设为 0 表示不限速
+        "rate_limit": env_number('GRAPHQL_RATE_LIMIT', '1', float, minimum=0.0),
+        # events: 下载原始事件后本地统计；groups: 由 Cloudflare 按维度聚合后返回计数
+        "mode": os.getenv('AGGREGATION_MODE', 'events'),
+        # 单小时单数据集最多翻页次数，超出后标记为截断
+        "max_pages": env_number('MAX_PAGES', '20'),
+        # GraphQL 端点，可指向本地的 mock_graphql_server.py 进行测试与压测
+        "url": os.getenv('GRAPHQL_URL', GRAPHQL_URL),
+        # 长期历史数据库，保存全部小时记录及日、月汇总
+        "sinks": [write_state, write_hourly_dashboard, HistorySink(os.getenv('HISTORY_DB', HISTORY_DB))],
+        # 每次运行追加一条指标记录（JSON Lines），设为空字符串时不写入
+        "metrics_file": os.getenv('METRICS_FILE', METRICS_FILE),
+        # cprofile 或 tracemalloc：对整次运行进行剖析，热点写入指标记录
+        "profile": os.getenv('PROFILE') or None,
+    }
+
+
+class Collector:
+    """按小时增量采集一个或多个 Zone 的统计，并把结果交给输出 sink。
+
+    窗口为截至 run(now) 的 retention_hours 个整点小时。zone_ids 为空时每次运行
+    通过 account_id 列出账户下的全部 Zone。sinks 是依次调用的
+    sink(output_dir, results, fetched, now, generated_at)，默认写入增量状态文件、
+    看板文件与长期历史；单个 Zone 输出到 output_dir，多个 Zone 时各 Zone 输出到
+    zones/<Zone ID>/，output_dir 写入账户级汇总。
+
+    GraphQL 客户端在第一次运行时才创建，之后复用；每个输出目录上次的结果保存在
+    内存中，同一进程内的后续运行不再读取状态文件。配置错误抛出 ConfigError。
+    """
+
+    def __init__(self, api_token, zone_ids=(), account_id=None, retention_hours=24, refetch_hours=2,
+                 batch_hours=6, concurrency=4, max_retries=4, rate_limit=1.0, mode="events",
+                 max_pages=20, url=GRAPHQL_URL, output_dir="", sinks=None,
+                 metrics_file=METRICS_FILE, profile=None):
+        if not api_token or not (zone_ids or account_id):
+            raise ConfigError("请设置环境变量 CLOUDFLARE_API_TOKEN 和 ZONE_ID（或 ACCOUNT_ID）")
+        if mode not in MODE_DATASETS:
+            raise ConfigError(f"未知的 AGGREGATION_MODE: {mode}（可选 events 或 groups）")
+        if profile and profile not in PROFILE_MODES:
+            raise ConfigError(f"未知的 PROFILE: {profile}（可选 {' 或 '.join(PROFILE_MODES)}）")
+        self.api_token = api_token
+        self.zone_ids = list(zone_ids)
+        self.account_id = account_id
+        self.retention_hours = max(1, retention_hours)
+        self.refetch_hours = max(1, refetch_hours)
+        self.batch_hours = max(1, batch_hours)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max(0, max_retries)
+        self.rate_limit = rate_limit
+        self.mode = mode
+        self.max_pages = max(1, max_pages)
+        self.url = url
+        self.output_dir = output_dir
+        self.sinks = list(sinks) if sinks is not None else [write_state, write_hourly_dashboard, HistorySink()]
+        self.metrics_file = metrics_file
+        self.profile = profile
+        self.connection = None
+        self.metrics = None
+        # 输出目录 -> {小时起始时间戳: 记录}，在同一进程的多次运行之间复用
+        self.state = {}
+
+    @classmethod
+    def from_env(cls):
+        """按 get.py 使用的环境变量（及 .env 文件）创建采集器。"""
+        return cls(**env_settings())
+
+    @property
+    def client(self):
+        """首次使用时才创建 GraphQL 客户端，之后的运行复用其连接池。"""
+        if self.connection is None:
+            self.connection = GraphQLClient(
+                self.api_token,
+                max_workers=self.concurrency,
+                max_retries=self.max_retries,
+                rate_limit=self.rate_limit or None,
+                url=self.url
+            )
+        return self.connection
+
+    def list_zones(self):
+        """返回要采集的 Zone：配置的 zone_ids，未配置时列出 account_id 下的全部 Zone。
+
+        无法列出（Token 无权访问、账户不存在或重试后仍失败）时抛出 ConfigError，入口据此退出。
+        """
+        if self.zone_ids:
+            return self.zone_ids
+        try:
+            zone_ids = self.client.list_zones(self.account_id)
+        except GraphQLRequestError as e:
+            raise ConfigError(f"无法列出账户 {self.account_id} 下的 Zone: {e}") from e
+        if not zone_ids:
+            raise ConfigError(f"账户 {self.account_id} 下没有可用的 Zone")
+        return zone_ids
+
+    def window(self, now):
+        """返回截至 now 的 retention_hours 个 (小时开始, 小时结束)。"""
+        return [
+            (now - timedelta(hours=i), now - timedelta(hours=i - 1))
+            for i in range(self.retention_hours, 0, -1)
+        ]
+
+    def load_state(self, output_dir):
+        """返回输出目录上次的结果：优先使用内存中的，其次读取状态文件。"""
+        if output_dir not in self.state:
+            self.state[output_dir] = load_existing_records(os.path.join(output_dir, OUTPUT_FILE))
+        return self.state[output_dir]
+
+    def write(self, output_dir, results, fetched, now, generated_at):
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        self.state[output_dir] = {record["since"]: record for record in results}
+        for sink in self.sinks:
+            sink(output_dir, results, fetched, now, generated_at)
+        # 窗口内的 WAF 统计直接由小时记录合并得到
+        print(f"{output_dir or '.'}: 最近 {len(results)} 小时 WAF 缓解请求数: {summarize_records(results).total}")
+
+    def run(self, now=None):
+        """采集截至 now（默认当前整点）的窗口并写入全部输出，返回本次运行的指标记录。"""
+        now = now or datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        self.metrics = metrics = RunMetrics(self.profile)
+        # 分类缓存在同一进程的多次运行之间共享，只报告本次运行的命中与未命中
+        cache_start = ua_cache_stats()
+        client = self.client
+        client.timings.clear()
+        hours = self.window(now)
+
+        with metrics.stage("list_zones"):
+            zone_ids = self.list_zones()
+        # 单个 Zone 时保持原有的输出位置；多个 Zone 时分别输出，根目录写入账户级汇总
+        multi_zone = len(zone_ids) > 1
+        collections = []
+        for zone_id in zone_ids:
+            output_dir = os.path.join(self.output_dir, ZONES_DIR, zone_id) if multi_zone else self.output_dir
+            collections.append(ZoneCollection(self, zone_id, output_dir, hours, now, self.load_state(output_dir)))
+
+        total_hours = sum(len(collection.missing_hours) for collection in collections)
+        reused_hours = sum(len(collection.records) for collection in collections)
+        print(f"共 {len(collections)} 个 Zone，复用已有 {reused_hours} 小时，开始获取 {total_hours} 小时的数据（每批 {self.batch_hours} 小时，并发 {self.concurrency}）...")
+        started = time.perf_counter()
+
+        # 先提交所有 Zone 的流量查询，事件批次按收集顺序滚动提交，由共享线程池在同一并发上限内执行
+        with metrics.stage("submit"):
+            for collection in collections:
+                collection.submit()
+            queue = BatchQueue(collections, self.concurrency)
+
+        progress = 0
+
+        def advance(hour_count):
+            nonlocal progress
+            progress += hour_count
+            print_progress(progress, total_hours)
+
+        for collection in collections:
+            collection.collect(queue, advance)
+
+        print("\n数据获取完成！")
+        timings = list(client.timings)
+        query_summary = summarize_queries(timings)
+        for name, item in query_summary.items():
+            print(f"  {name}: {item['count']} 次，{item['seconds']:.3f}s（最长 {item['max_seconds']:.3f}s），{item['bytes']} 字节，{item['rows']} 行")
+        print(f"共 {len(timings)} 个请求，总耗时 {time.perf_counter() - started:.2f}s")
+        failed_hours = sum(len(collection.failed) for collection in collections)
+        if failed_hours:
+            print(f"有 {failed_hours} 小时获取失败，已保留上次的结果并将在下次运行时重试")
+        cache = ua_cache_stats(since=cache_start)
+        print(f"UA 分类缓存: 命中 {cache['hits']}，未命中 {cache['misses']}，缓存 {cache['size']} 条")
+
+        generated_at = int(time.time())
+        with metrics.stage("write"):
+            for collection in collections:
+                self.write(collection.output_dir, collection.results(), collection.fetched, now, generated_at)
+            if multi_zone:
+                account_results, account_fetched = merge_zone_records(collections, self.load_state(self.output_dir))
+                self.write(self.output_dir, account_results, account_fetched, now, generated_at)
+
+        # 翻页请求发生在遍历事件流的过程中，从聚合耗时中扣除，使 aggregate 只包含解析与分类
+        metrics.stages["aggregate"] -= metrics.stages["page_fetch"]
+        fetched = [record for collection in collections for record in collection.fetched]
+        metrics.set(
+            generated_at=generated_at,
+            mode=self.mode,
+            zones=len(collections),
+            batch_hours=self.batch_hours,
+            concurrency=self.concurrency,
+            hours_fetched=len(fetched),
+            hours_reused=reused_hours,
+            hours_failed=failed_hours,
+            truncated_hours={
+                "waf": sorted({record["since"] for record in fetched if record.get("waf_truncated")}),
+                "user_agents": sorted({record["since"] for record in fetched if record.get("user_agents_truncated")}),
+            },
+            ua_cache=cache,
+            query_summary=query_summary,
+            queries=timings,
+        )
+        run_record = metrics.finish(os.path.join(self.output_dir, PROFILE_FILE))
+        print("阶段耗时: " + "，".join(f"{name} {seconds:.3f}s" for name, seconds in run_record["stages"].items()))
+        if self.profile:
+            print(f"剖析结果已写入指标记录（{self.profile}）" + (f"，原始数据见 {PROFILE_FILE}" if self.profile == "cprofile" else ""))
+        if self.metrics_file:
+            append_jsonl(os.path.join(self.output_dir, self.metrics_file), run_record)
+            print(f"运行指标已追加到 {self.metrics_file}")
+        return run_record
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,84 @@
+import gzip
+import json
+
+try:
+    import brotli
+except ImportError:
+    # brotli 为可选依赖，未安装时只生成 gzip 版本
+    brotli = None
+
+# 首屏需要的标量字段，写入体积很小的概览文件
+SUMMARY_FIELDS = (
+    "since",
+    "until",
+    "total_requests",
+    "total_bytes",
+    "cached_requests",
+    "cached_bytes",
+    "bandwidth_saved_percent",
+    "status_classes",
+    "peak_rps",
+    "origin_response_ms",
+    "waf_mitigated_requests",
+    "unique_visitors",
+    "unique_user_agents",
+    "unique_waf_ips",
+    "waf_truncated",
+    "user_agents_truncated",
+    "failed",
+)
+
+# 排行字段及其名称键，写入可延迟加载的明细文件
+BREAKDOWN_FIELDS = {
+    "top_user_agents": "browser",
+    "top_browser_versions": "browser",
+    "top_operating_systems": "os",
+    "device_types": "device",
+    "top_bots": "name",
+    "top_countries": "country",
+    "top_waf_countries": "country",
+    "top_waf_asns": "asn",
+}
+
+
+def write_json(path, data):
+    """写入压缩格式的 JSON，并生成预压缩的 .gz（以及可用时的 .br）文件。"""
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(payload)
+    # 固定 mtime，内容不变时压缩结果也不变，避免产生无意义的提交
+    with open(f"{path}.gz", "wb") as f:
+        f.write(gzip.compress(payload, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(f"{path}.br", "wb") as f:
+            f.write(brotli.compress(payload))
+
+
+def split_records(records):
+    """把小时记录拆分为列式的概览与明细两部分。
+
+    概览中每个字段是一个数组；明细中每个排行字段是一个数组，元素为该小时的
+    [名称, 请求数] 列表。Bot 的元数据只在 bot_metadata 中出现一次。
+    """
+    summary = {field: [record.get(field) for record in records] for field in SUMMARY_FIELDS}
+
+    breakdowns = {}
+    bot_metadata = {}
+    for field, name_key in BREAKDOWN_FIELDS.items():
+        breakdowns[field] = [
+            [[item[name_key], item["requests"]] for item in record.get(field, [])]
+            for record in records
+        ]
+    for record in records:
+        for bot in record.get("top_bots", []):
+            bot_metadata[bot["name"]] = [bot["operator"], bot["classification"], bot["signature"]]
+
+    return summary, {"columns": breakdowns, "bot_metadata": bot_metadata}
+
+
+def write_dashboard(prefix, records, generated_at):
+    """为看板写入 {prefix}_summary.json 与 {prefix}_breakdowns.json。"""
+    summary, breakdowns = split_records(records)
+    write_json(f"{prefix}_summary.json", {"generated_at": generated_at, "columns": summary})
+    write_json(f"{prefix}_breakdowns.json", breakdowns)
+    return [f"{prefix}_summary.json", f"{prefix}_breakdowns.json"]
@@ -0,0 +1,252 @@
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+GRAPHQL_URL = "https://api.cloudflare.com/client/v4/graphql"
+ZONES_URL = "https://api.cloudflare.com/client/v4/zones"
+
+QUERY_NAME_PATTERN = re.compile(r"query\s+(\w+)")
+
+# 可以通过重试恢复的 HTTP 状态码
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class GraphQLRequestError(Exception):
+    """查询在用尽重试次数后仍然失败，或遇到不可重试的错误。"""
+
+
+class TokenBucket:
+    """令牌桶限速器：平均每秒最多放行 rate 个请求，最多允许 capacity 个突发。"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                current = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (current - self.updated) * self.rate)
+                self.updated = current
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_rate_limited(data):
+    """判断 GraphQL 响应中的错误是否为限流。"""
+    if not isinstance(data, dict):
+        return False
+    for error in data.get("errors") or []:
+        if not isinstance(error, dict):
+            continue
+        code = str((error.get("extensions") or {}).get("code", "")).lower()
+        message = str(error.get("message", "")).lower()
+        if "rate" in code and "limit" in code or "rate limit" in message or "limit reached" in message:
+            return True
+    return False
+
+
+def zone_result(data, *aliases):
+    """返回响应中第一个 Zone 的数据集，并确认 aliases 中的数据集都存在。
+
+    Cloudflare 经常以 HTTP 200 返回 errors 与 data: null；这类响应、Zone 不存在或
+    数据集缺失都抛出 GraphQLRequestError，不能当作没有流量的小时。
+    """
+    if data.get("errors"):
+        raise GraphQLRequestError(f"GraphQL错误: {data['errors']}")
+    zones = ((data.get("data") or {}).get("viewer") or {}).get("zones") or []
+    if not zones or not zones[0]:
+        raise GraphQLRequestError("响应中没有 Zone 数据（Zone 不存在或无权访问）")
+    missing = [alias for alias in aliases if zones[0].get(alias) is None]
+    if missing:
+        raise GraphQLRequestError(f"响应中缺少数据集: {', '.join(missing)}")
+    return zones[0]
+
+
+def count_rows(data):
+    """统计 viewer.zones 下各数据集返回的行数之和。"""
+    zones = ((data.get("data") or {}).get("viewer") or {}).get("zones") or []
+    return sum(len(rows) for zone in zones for rows in zone.values() if isinstance(rows, list))
+
+
+def retry_after_seconds(response):
+    """解析 Retry-After 头（秒数形式），无法解析时返回 None。"""
+    value = response.headers.get("Retry-After") if response is not None else None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class EventStream:
+    """以 datetime 为游标分页遍历事件，逐条产出而不保留已处理的页。
+
+    first_page 为已获取的首页（None 表示从 cursor 处开始请求），fetch_page(cursor)
+    返回从 cursor 时刻（含）开始、按 datetime 升序的下一页。首页满额时继续按游标
+    请求后续页；遍历结束后 truncated 表示是否因页数上限或同一秒内事件过多而未能取完。
+    """
+
+    def __init__(self, first_page, fetch_page, page_size, max_pages, cursor=None):
+        self.first_page = first_page
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.cursor = cursor
+        self.pages = 0
+        self.truncated = False
+
+    def __iter__(self):
+        page, self.first_page = self.first_page, None
+        if page is None:
+            page = self.fetch_page(self.cursor)
+        skip = 0
+        while True:
+            self.pages += 1
+            # 新页从游标时刻（含）开始，跳过上一页已产出的同一秒事件
+            yield from page[skip:]
+            if len(page) < self.page_size:
+                return
+            if self.pages >= self.max_pages:
+                self.truncated = True
+                return
+
+            cursor = page[-1]["datetime"]
+            tied = sum(1 for event in page if event["datetime"] == cursor)
+            if tied == len(page):
+                # 整页都在同一秒内，无法继续翻页，只能跳过这一秒剩余的事件
+                self.truncated = True
+                cursor_time = datetime.strptime(cursor, "%Y-%m-%dT%H:%M:%SZ") + timedelta(seconds=1)
+                cursor, skip = cursor_time.strftime("%Y-%m-%dT%H:%M:%SZ"), 0
+            else:
+                skip = tied
+            page = self.fetch_page(cursor)
+
+
+class GraphQLClient:
+    """共享连接池的 Cloudflare GraphQL 客户端，可并发提交多个查询。"""
+
+    def __init__(self, api_token, max_workers=4, timeout=30, max_retries=4,
+                 rate_limit=None, backoff_base=1.0, backoff_cap=30.0, url=GRAPHQL_URL):
+        self.url = url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        # rate_limit 为每秒查询数上限，None 表示不限速
+        self.bucket = TokenBucket(rate_limit, max(1, max_workers)) if rate_limit else None
+        # requests 导入较慢（约 0.1s），只在创建客户端时加载；
+        # 只使用 EventStream 等工具的模块（聚合、Logpush 读取）不需要它
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        # 连接池大小与并发数一致，保证每个工作线程都能复用已建立的 TLS 连接
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_token}",
+            "Content-Type": "application/json"
+        })
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.timings = []
+
+    def backoff(self, attempt, retry_after=None):
+        """指数退避加随机抖动；服务端给出 Retry-After 时至少等待该时长。"""
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def request(self, name, method, url, **kwargs):
+        """经限速器发送一个 HTTP 请求，可恢复的错误按退避策略重试，返回 (响应, JSON 数据, 尝试次数, 最后一次耗时)。
+
+        网络与传输错误（连接、超时、响应体截断或解码失败等 requests 异常）、无法解析或不是对象的响应、
+        HTTP 429/5xx 以及限流错误会重试；其余 HTTP 错误直接失败。最终失败时抛出 GraphQLRequestError。
+        """
+        import requests
+        for attempt in range(self.max_retries + 1):
+            if self.bucket:
+                self.bucket.acquire()
+            started = time.perf_counter()
+            response = None
+            try:
+                response = getattr(self.session, method)(url=url, timeout=self.timeout, **kwargs)
+                if response.status_code in RETRYABLE_STATUS:
+                    error = requests.HTTPError(f"HTTP {response.status_code}", response=response)
+                else:
+                    response.raise_for_status()
+                    data = response.json()
+                    if not isinstance(data, dict):
+                        error = ValueError(f"响应不是 JSON 对象: {type(data).__name__}")
+                    elif is_rate_limited(data):
+                        error = RuntimeError(f"限流: {data['errors']}")
+                    else:
+                        error = None
+            except requests.HTTPError as e:
+                raise GraphQLRequestError(f"{name} 请求失败: {e}") from e
+            except (requests.RequestException, ValueError) as e:
+                error = e
+            if error is None:
+                return response, data, attempt + 1, time.perf_counter() - started
+
+            if attempt == self.max_retries:
+                raise GraphQLRequestError(f"{name} 重试 {self.max_retries} 次后仍失败: {error}") from error
+            delay = self.backoff(attempt, retry_after_seconds(response))
+            print(f"\n{name} 请求失败，{delay:.1f} 秒后进行第 {attempt + 1} 次重试: {error}")
+            time.sleep(delay)
+
+    def fetch(self, query, variables):
+        """同步执行一个 GraphQL 查询（重试规则见 request），记录耗时并返回响应数据。"""
+        match = QUERY_NAME_PATTERN.search(query)
+        name = match.group(1) if match else "anonymous"
+        response, data, attempts, seconds = self.request(
+            name, "post", self.url, json={"query": query, "variables": variables}
+        )
+        self.timings.append({
+            "query": name,
+            "seconds": round(seconds, 3),
+            "bytes": len(response.content),
+            "rows": count_rows(data),
+            "attempts": attempts,
+        })
+        return data
+
+    def list_zones(self, account_id):
+        """通过 REST API 列出账户下全部 Zone 的 ID，与 GraphQL 查询共用限速与重试。"""
+        zone_ids = []
+        page = 1
+        while True:
+            data = self.request(
+                "ListZones", "get", ZONES_URL,
+                params={"account.id": account_id, "per_page": 50, "page": page}
+            )[1]
+            try:
+                zone_ids.extend(zone["id"] for zone in data["result"])
+                total_pages = data["result_info"]["total_pages"]
+            except (KeyError, TypeError) as e:
+                raise GraphQLRequestError(f"Zone 列表格式错误: {e!r}") from e
+            if page >= total_pages:
+                return zone_ids
+            page += 1
+
+    def submit(self, query, variables):
+        """把查询提交到线程池，返回 Future。"""
+        return self.executor.submit(self.fetch, query, variables)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,197 @@
+import json
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from aggregator import HourlyAggregator
+from traffic_metrics import merge_traffic_fields
+
+# 看板可请求的时间范围：名称 -> (汇总粒度, 数据点数量)
+HISTORY_VIEWS = {
+    "7d": ("hour", 7 * 24),
+    "30d": ("day", 30),
+    "1y": ("month", 12),
+}
+# 原始小时记录只保留 7d 视图需要的部分（按整天裁剪），更早的数据由日、月汇总提供
+HOURLY_RETENTION_HOURS = HISTORY_VIEWS["7d"][1]
+# 只在采集过程中使用、不写入历史库的字段
+TRANSIENT_FIELDS = ("minute_requests",)
+
+
+def day_start(timestamp):
+    moment = datetime.fromtimestamp(timestamp, timezone.utc)
+    return int(moment.replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+
+
+def month_start(timestamp):
+    moment = datetime.fromtimestamp(timestamp, timezone.utc)
+    return int(moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0).timestamp())
+
+
+def next_month_start(timestamp):
+    moment = datetime.fromtimestamp(month_start(timestamp), timezone.utc)
+    return int((moment + timedelta(days=32)).replace(day=1).timestamp())
+
+
+def load_existing_records(path):
+    """读取上一次运行输出的小时记录文件，按 since 时间戳建立索引。"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if not isinstance(data, list):
+        return {}
+    return {
+        record["since"]: record
+        for record in data
+        if isinstance(record, dict) and "since" in record
+    }
+
+
+def settled_records(existing, hours, now, refetch_hours):
+    """返回 hours（(小时开始, 小时结束) 列表）中可以直接复用的已有记录 {since: 记录}。
+
+    最近 refetch_hours 小时的数据可能仍在补齐，上次获取失败的小时也需要重试，
+    只有早于此且没有 failed 标记的记录才算已定稿。
+    """
+    refetch_since = int((now - timedelta(hours=refetch_hours)).timestamp())
+    return {
+        since_ts: existing[since_ts]
+        for since_ts in (int(since_time.timestamp()) for since_time, _ in hours)
+        if since_ts in existing
+        and since_ts < refetch_since
+        and not existing[since_ts].get("failed")
+    }
+
+
+def merge_records(records, since, until):
+    """把若干条记录合并为覆盖 [since, until) 的一条记录，字段与小时记录一致。
+
+    浏览器排行只保存了每小时的前 10 项，合并结果是这些前 10 项之和。
+    """
+    aggregator = HourlyAggregator()
+    waf_truncated = user_agents_truncated = False
+    for record in records:
+        aggregator.merge(HourlyAggregator.from_record(record))
+        waf_truncated = waf_truncated or record.get("waf_truncated", False)
+        user_agents_truncated = user_agents_truncated or record.get("user_agents_truncated", False)
+
+    return {
+        "since": since,
+        "until": until,
+        **merge_traffic_fields(records),
+        **aggregator.results(),
+        "waf_truncated": waf_truncated,
+        "user_agents_truncated": user_agents_truncated
+    }
+
+
+class HistoryStore:
+    """基于 SQLite 的长期历史：保存原始小时记录，并随小时写入增量维护日、月汇总。
+
+    每写入一批小时，只重算这些小时所在的日（读取当日最多 24 条小时记录）
+    和所在的月（读取当月最多 31 条日汇总），不会扫描全部历史。原始小时记录只保留
+    最近 HOURLY_RETENTION_HOURS 小时所在的整天，更早的日汇总已经定稿，数据库大小不随时间持续增长。
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS hourly (
+                since INTEGER PRIMARY KEY,
+                until INTEGER NOT NULL,
+                record TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS rollups (
+                period TEXT NOT NULL,
+                since INTEGER NOT NULL,
+                until INTEGER NOT NULL,
+                record TEXT NOT NULL,
+                PRIMARY KEY (period, since)
+            );
+        """)
+
+    def add_hours(self, records):
+        """写入（或覆盖）小时记录，更新受影响的日、月汇总，并裁剪过期的小时记录。
+
+        属于已裁剪日期的记录会被忽略：这些日的小时记录已经删除，只用新记录重算会得到错误的汇总。
+        """
+        records = list(records)
+        if not records:
+            return
+        latest = max([record["since"] for record in records] + [self.latest_hour() or 0])
+        cutoff = day_start(latest - HOURLY_RETENTION_HOURS * 3600)
+        finished = {
+            row[0] for row in self.connection.execute(
+                "SELECT since FROM rollups WHERE period = 'day' AND since < ?", (cutoff,)
+            )
+        }
+        records = [record for record in records if day_start(record["since"]) not in finished]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO hourly (since, until, record) VALUES (?, ?, ?)",
+                [
+                    (record["since"], record["until"], json.dumps(
+                        {key: value for key, value in record.items() if key not in TRANSIENT_FIELDS},
+                        ensure_ascii=False
+                    ))
+                    for record in records
+                ]
+            )
+            days = sorted({day_start(record["since"]) for record in records})
+            for day in days:
+                self.rebuild_rollup("day", day, day + 86400, "hour")
+            for month in sorted({month_start(day) for day in days}):
+                self.rebuild_rollup("month", month, next_month_start(month), "day")
+            pruned = self.connection.execute("DELETE FROM hourly WHERE since < ?", (cutoff,)).rowcount
+        if pruned:
+            # 释放删除记录占用的页，否则文件大小不会减小
+            self.connection.execute("VACUUM")
+
+    def latest_hour(self):
+        """返回最新一条小时记录的起始时间戳，没有记录时返回 None。"""
+        return self.connection.execute("SELECT MAX(since) FROM hourly").fetchone()[0]
+
+    def rebuild_rollup(self, period, since, until, source_period):
+        """用下一级粒度（source_period）的记录重新计算一条汇总。"""
+        record = merge_records(self.query(source_period, since, until), since, until)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO rollups (period, since, until, record) VALUES (?, ?, ?, ?)",
+            (period, since, until, json.dumps(record, ensure_ascii=False))
+        )
+
+    def query(self, period, since, until):
+        """返回 [since, until) 内指定粒度（hour/day/month）的记录，按时间升序。"""
+        if period == "hour":
+            rows = self.connection.execute(
+                "SELECT record FROM hourly WHERE since >= ? AND since < ? ORDER BY since",
+                (since, until)
+            )
+        else:
+            rows = self.connection.execute(
+                "SELECT record FROM rollups WHERE period = ? AND since >= ? AND since < ? ORDER BY since",
+                (period, since, until)
+            )
+        return [json.loads(row[0]) for row in rows]
+
+    def view(self, name, now):
+        """按 HISTORY_VIEWS 中的名称返回截至 now 的记录。"""
+        period, points = HISTORY_VIEWS[name]
+        if period == "hour":
+            since = now - points * 3600
+        elif period == "day":
+            since = day_start(now) - (points - 1) * 86400
+        else:
+            since = month_start(now)
+            for _ in range(points - 1):
+                since = month_start(since - 1)
+        return self.query(period, since, now + 1)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,196 @@
+"""流式读取 Cloudflare Logpush 导出的 NDJSON（可 gzip 压缩），按小时汇总为与 get.py 相同的小时记录。
+
+只取统计需要的字段，每行解析后立即计入所在小时的计数器，不保留原始行；
+内存只与小时数和不同 UA/国家的数量有关，与文件大小无关。
+未压缩的文件通过 mmap 逐行读取，gzip 文件按块流式解压。
+
+用法: python logpush_reader.py logs/*.ndjson.gz [--prefix logpush_hourly] [--history-db cloudflare_history.sqlite3]
+"""
+import argparse
+import gzip
+import json
+import mmap
+import os
+import time
+from collections import Counter
+
+try:
+    import orjson
+except ImportError:
+    # orjson 为可选依赖，未安装时使用标准库解析
+    orjson = None
+
+from aggregator import COUNTED_RESPONSE_STATUSES, HourlyAggregator
+from dashboard_output import write_dashboard
+from history_store import HistoryStore
+from traffic_metrics import STATUS_CLASSES, traffic_fields
+from waf_analytics import WAF_ACTIONS, hour_start
+
+LOGPUSH_FIELDS = (
+    "ClientRequestUserAgent",
+    "ClientCountry",
+    "EdgeResponseStatus",
+    "EdgeStartTimestamp",
+    "WAFAction",
+    "EdgeResponseBytes",
+    "ClientIP",
+    "ClientASN",
+)
+
+loads = orjson.loads if orjson is not None else json.loads
+MITIGATION_ACTIONS = frozenset(WAF_ACTIONS)
+
+
+def iter_lines(path):
+    """逐行产出文件内容（bytes），.gz 流式解压，其余文件通过 mmap 读取。"""
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            yield from f
+        return
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        yield from iter(mapped.readline, b"")
+
+
+def checked(record, field, kind):
+    """返回 record 中 field 的值（缺失时为 None），类型不是 kind 时抛出 TypeError。"""
+    value = record.get(field)
+    if value is not None and not isinstance(value, kind):
+        raise TypeError(f"{field} 类型错误: {value!r}")
+    return value
+
+
+def timestamp_seconds(value):
+    """把 EdgeStartTimestamp（RFC3339 字符串，或秒/毫秒/纳秒整数）转换为秒级时间戳。"""
+    if isinstance(value, str):
+        return hour_start(value[:13]) + int(value[14:16]) * 60 + int(value[17:19])
+    if value > 10 ** 15:
+        value //= 10 ** 9
+    elif value > 10 ** 11:
+        value //= 1000
+    return int(value)
+
+
+class LogpushAggregator:
+    """把 Logpush 记录按小时分桶，累计请求数、字节数、状态码分类、每分钟请求数以及 UA、国家与 WAF 计数。
+
+    每个小时只保留一个 HourlyAggregator：UA 在写入时分类（describe_user_agent 带缓存），
+    只累计浏览器、Bot、版本、系统与设备计数，不同 UA 的数量写入 HyperLogLog，
+    因此内存不随 UA 种类增长。
+    正常请求的判定与 get.py 的 UA 查询一致（只统计 COUNTED_RESPONSE_STATUSES），
+    WAF 缓解请求按 WAFAction 计入 WAF 统计。
+    独立访客只写入每小时固定大小的 HyperLogLog，不保留 IP 列表。
+    字段类型不符的行（例如字符串形式的字节数）整行跳过，计入 skipped。
+    """
+
+    def __init__(self):
+        self.hours = {}
+        self.lines = 0
+        self.skipped = 0
+
+    def add_line(self, line):
+        if not line.strip():
+            return
+        self.lines += 1
+        try:
+            record = loads(line)
+            second = timestamp_seconds(record["EdgeStartTimestamp"])
+            self.add(second, record)
+        except (ValueError, KeyError, TypeError):
+            self.skipped += 1
+
+    def add(self, second, record):
+        """计入一条记录；字段类型不符时抛出 TypeError，此时不修改任何计数。"""
+        response_bytes = checked(record, "EdgeResponseBytes", int) or 0
+        country = (checked(record, "ClientCountry", str) or "XX").upper()
+        action = checked(record, "WAFAction", str)
+        user_agent = checked(record, "ClientRequestUserAgent", str) or ""
+        client_ip = checked(record, "ClientIP", str)
+        asn = checked(record, "ClientASN", int)
+        status = record.get("EdgeResponseStatus")
+
+        hour = second // 3600 * 3600
+        bucket = self.hours.get(hour)
+        if bucket is None:
+            bucket = self.hours[hour] = {
+                "requests": 0,
+                "bytes": 0,
+                "status_classes": [0] * len(STATUS_CLASSES),
+                "minutes": Counter(),
+                "aggregator": HourlyAggregator(),
+            }
+        bucket["requests"] += 1
+        bucket["bytes"] += response_bytes
+        bucket["minutes"][second // 60] += 1
+        if isinstance(status, int) and 100 <= status < 600:
+            bucket["status_classes"][status // 100 - 1] += 1
+        if action in MITIGATION_ACTIONS:
+            bucket["aggregator"].add_waf_event({
+                "action": action,
+                "clientCountryName": country,
+                "clientIP": client_ip,
+                "clientAsn": asn,
+            })
+        elif status in COUNTED_RESPONSE_STATUSES:
+            bucket["aggregator"].add_request({
+                "userAgent": user_agent,
+                "clientCountryName": country,
+                "clientIP": client_ip,
+            })
+
+    def add_file(self, path):
+        for line in iter_lines(path):
+            self.add_line(line)
+
+    def records(self):
+        """按时间升序返回与 get.py 输出字段一致的小时记录。"""
+        records = []
+        for since in sorted(self.hours):
+            bucket = self.hours[since]
+            records.append({
+                "since": since,
+                "until": since + 3600,
+                # 与 GraphQL 路径一致，峰值为最忙一分钟的平均每秒请求数
+                **traffic_fields(
+                    {"requests": bucket["requests"], "bytes": bucket["bytes"], "status_classes": bucket["status_classes"]},
+                    peak_rps=round(max(bucket["minutes"].values()) / 60, 2)
+                ),
+                **bucket["aggregator"].results(),
+                "waf_truncated": False,
+                "user_agents_truncated": False
+            })
+        return records
+
+
+def read_logpush_files(paths):
+    """读取若干 Logpush 文件（同一小时可以分布在多个文件中），返回汇总器。"""
+    aggregator = LogpushAggregator()
+    for path in paths:
+        aggregator.add_file(path)
+    return aggregator
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把 Logpush NDJSON 导出汇总为小时记录与看板文件")
+    parser.add_argument("paths", nargs="+", help="Logpush 文件（.ndjson 或 .ndjson.gz 等）")
+    parser.add_argument("--prefix", default="logpush_hourly", help="看板文件前缀")
+    parser.add_argument("--history-db", help="同时写入此长期历史数据库")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    aggregator = read_logpush_files(args.paths)
+    records = aggregator.records()
+    elapsed = time.perf_counter() - started
+    print(f"读取 {aggregator.lines} 行（跳过 {aggregator.skipped} 行），共 {len(records)} 小时，耗时 {elapsed:.2f}s")
+
+    for dashboard_file in write_dashboard(args.prefix, records, int(time.time())):
+        print(f"看板数据已导出到 {dashboard_file}")
+    if args.history_db:
+        with HistoryStore(args.history_db) as store:
+            store.add_hours(records)
+        print(f"已写入长期历史 {args.history_db}")
+
+
+if __name__ == "__main__":
+    main()
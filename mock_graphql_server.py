@@ -0,0 +1,385 @@
+"""本地模拟的 Cloudflare GraphQL 服务，用于在没有 API Token 时运行、测试与压测采集流程。
+
+支持 httpRequests1hGroups/1mGroups、firewallEventsAdaptive(Groups) 与 httpRequestsAdaptive(Groups)，
+按别名解析批量查询，遵守 datetime 过滤、limit 与 orderBy 分页语义。事件按
+(Zone, 数据集, 小时) 由固定种子生成，相同参数下每次运行得到相同的数据。
+可配置每小时事件量、响应延迟与错误注入（可以只对部分 Zone 注入）；也可以用 --recorded 指定录制的事件样本，
+生成的事件从样本中抽取字段，只替换 datetime。
+
+用法: python mock_graphql_server.py [--port 8787] [--events-per-hour 1000] ...
+随后设置 GRAPHQL_URL=http://127.0.0.1:8787/graphql 运行 get.py。
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from user_agent_corpus import BROWSER_USER_AGENTS
+from user_agent_parser import BOT_SIGNATURES
+from waf_analytics import WAF_ACTIONS
+
+COUNTRIES = ("US", "CN", "HK", "TW", "JP", "DE", "GB", "FR", "SG", "KR", "RU", "BR", "IN", "XX", "T1")
+WAF_SOURCES = ("firewallManaged", "firewallCustom", "waf", "ratelimit", "bic")
+WAF_ASNS = (4134, 4837, 14061, 16509, 24940, 45102, 13335, 396982)
+RESPONSE_STATUSES = (200, 200, 200, 200, 304, 301, 206)
+BYTES_PER_REQUEST = 24 * 1024
+# 由缓存直接响应的请求比例
+CACHED_RATIO = 0.6
+
+# [别名:] 数据集(参数) { 字段 }
+DATASET_PATTERN = re.compile(
+    r"(?:(\w+)\s*:\s*)?"
+    r"(httpRequests1hGroups|httpRequests1mGroups|firewallEventsAdaptive(?:Groups)?|httpRequestsAdaptive(?:Groups)?)\s*\("
+)
+ERROR_KINDS = ("http_503", "http_429", "rate_limit")
+# 另外可注入的错误：HTTP 200 返回 data: null 与不可重试的 GraphQL 错误
+GRAPHQL_ERROR = "graphql_error"
+
+
+def parse_datetime(value):
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+
+
+def format_datetime(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def build_user_agents(variety, seed):
+    """生成指定数量的不同 UA：浏览器与 Bot 模板加上随机版本号。"""
+    rng = random.Random(f"{seed}:ua")
+    templates = [ua for ua in BROWSER_USER_AGENTS if ua]
+    templates += [
+        f"Mozilla/5.0 (compatible; {signatures[0]}/1.0; +https://example.com/bot)"
+        for signatures, _ in BOT_SIGNATURES
+    ]
+    user_agents = list(templates)
+    while len(user_agents) < variety:
+        template = rng.choice(templates)
+        user_agents.append(f"{template} Build/{rng.randrange(1, 10 ** 6)}")
+    return user_agents[:max(1, variety)]
+
+
+def split_blocks(query):
+    """把查询拆分为 [(别名, 数据集, 块文本)]，块文本用于解析该别名的参数与字段。"""
+    matches = list(DATASET_PATTERN.finditer(query))
+    return [
+        (
+            match.group(1) or match.group(2),
+            match.group(2),
+            query[match.end():matches[i + 1].start() if i + 1 < len(matches) else len(query)],
+        )
+        for i, match in enumerate(matches)
+    ]
+
+
+def block_argument(block, name, variables):
+    """读取块内某个参数的值，参数可以是字面量或 $变量。"""
+    match = re.search(rf"\b{name}\s*:\s*(\$?[\w\-:]+)", block)
+    if not match:
+        return None
+    value = match.group(1)
+    return variables.get(value[1:]) if value.startswith("$") else value
+
+
+def block_fields(block, selection):
+    """返回块中 selection（如 dimensions）或顶层选择集中的字段名。"""
+    if selection:
+        match = re.search(rf"{selection}\s*\{{([^}}]*)\}}", block)
+    else:
+        match = re.search(r"\)\s*\{([^{}]*)\}", block)
+    return match.group(1).split() if match else []
+
+
+class MockGraphQLServer:
+    """在后台线程中运行的模拟 GraphQL 服务，stats 记录请求数、错误数与返回的事件数。"""
+
+    def __init__(self, host="127.0.0.1", port=0, events_per_hour=1000, waf_events_per_hour=100,
+                 latency=0.0, jitter=0.0, error_rate=0.0, error_kinds=ERROR_KINDS,
+                 ua_variety=200, seed=0, recorded=None, error_zones=()):
+        self.events_per_hour = events_per_hour
+        self.waf_events_per_hour = waf_events_per_hour
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_kinds = tuple(error_kinds)
+        # 这些 Zone 的查询总是返回 HTTP 503
+        self.error_zones = set(error_zones)
+        self.seed = seed
+        self.user_agents = build_user_agents(ua_variety, seed)
+        # 录制样本: {"ua": [事件, ...], "waf": [事件, ...]}
+        self.recorded = recorded or {}
+        self.rng = random.Random(f"{seed}:errors")
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.httpd = ThreadingHTTPServer((host, port), MockGraphQLHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/graphql"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def count(self, **values):
+        with self.lock:
+            self.stats.update(values)
+
+    def pick_error(self):
+        with self.lock:
+            if self.error_rate and self.rng.random() < self.error_rate:
+                return self.rng.choice(self.error_kinds)
+        return None
+
+    @lru_cache(maxsize=512)
+    def hour_events(self, zone, kind, hour_ts):
+        """按固定种子生成某个 Zone 某个小时的全部事件，按 datetime 升序。"""
+        rng = random.Random(f"{self.seed}:{zone}:{kind}:{hour_ts}")
+        volume = self.waf_events_per_hour if kind == "waf" else self.events_per_hour
+        offsets = sorted(rng.randrange(3600) for _ in range(volume))
+        start = datetime.fromtimestamp(hour_ts, timezone.utc)
+        samples = self.recorded.get(kind)
+        events = []
+        for offset in offsets:
+            if samples:
+                event = dict(rng.choice(samples))
+            elif kind == "waf":
+                event = {
+                    "action": rng.choice(WAF_ACTIONS),
+                    "clientCountryName": rng.choice(COUNTRIES),
+                    "ruleId": f"{rng.randrange(32):032x}",
+                    "source": rng.choice(WAF_SOURCES),
+                    "clientIP": f"203.0.113.{rng.randrange(256)}",
+                    "clientAsn": rng.choice(WAF_ASNS),
+                }
+            else:
+                event = {
+                    "userAgent": rng.choice(self.user_agents),
+                    "clientCountryName": rng.choice(COUNTRIES),
+                    "edgeResponseStatus": rng.choice(RESPONSE_STATUSES),
+                    "clientIP": f"198.51.{rng.randrange(256)}.{rng.randrange(256)}",
+                }
+            event["datetime"] = format_datetime(start + timedelta(seconds=offset))
+            events.append(event)
+        return events
+
+    @lru_cache(maxsize=512)
+    def hour_statuses(self, zone, hour_ts, minutes):
+        """某小时的状态码计数，按小时或分钟前缀分组；WAF 拦截的请求计为 403。"""
+        buckets = {}
+        for kind in ("ua", "waf"):
+            for event in self.hour_events(zone, kind, hour_ts):
+                prefix = event["datetime"][:16 if minutes else 13]
+                statuses = buckets.setdefault(prefix, Counter())
+                statuses[event.get("edgeResponseStatus", 403)] += 1
+        return buckets
+
+    def window_events(self, zone, kind, since, until):
+        """返回 [since, until) 内的事件，since 可以落在小时中间（分页游标）。"""
+        since_time, until_time = parse_datetime(since), parse_datetime(until)
+        hour = since_time.replace(minute=0, second=0)
+        while hour < until_time:
+            for event in self.hour_events(zone, kind, int(hour.timestamp())):
+                if since <= event["datetime"] < until:
+                    yield event
+            hour += timedelta(hours=1)
+
+    def resolve(self, query, variables):
+        """按别名逐个生成查询结果，返回 (zone 数据, 事件数)。分组行按其 count 计入事件数。"""
+        zone_id = variables.get("zoneTag", "")
+        zone = {}
+        event_count = 0
+        for alias, dataset, block in split_blocks(query):
+            since = block_argument(block, "datetime_geq", variables)
+            until = block_argument(block, "datetime_lt", variables)
+            limit = int(block_argument(block, "limit", variables) or 10000)
+            if since is None or until is None:
+                continue
+            if dataset in ("httpRequests1hGroups", "httpRequests1mGroups"):
+                dimension = (block_fields(block, "dimensions") or ["datetime"])[0]
+                zone[alias] = self.traffic_groups(zone_id, since, until, limit, dataset, dimension)
+                continue
+            kind = "waf" if dataset.startswith("firewall") else "ua"
+            events = self.window_events(zone_id, kind, since, until)
+            if dataset.endswith("Groups"):
+                result = self.event_groups(events, block_fields(block, "dimensions"), limit, "quantiles" in block)
+                event_count += sum(row["count"] for row in result)
+            else:
+                fields = block_fields(block, None)
+                result = []
+                for event in events:
+                    if len(result) >= limit:
+                        break
+                    result.append({field: event.get(field) for field in fields})
+                event_count += len(result)
+            zone[alias] = result
+        return zone, event_count
+
+    def traffic_groups(self, zone_id, since, until, limit, dataset, dimension):
+        """按小时或分钟汇总生成的事件，得到与 httpRequests1hGroups/1mGroups 相同结构的分组。"""
+        minutes = dataset == "httpRequests1mGroups"
+        step = timedelta(minutes=1) if minutes else timedelta(hours=1)
+        groups = []
+        moment = parse_datetime(since)
+        until_time = parse_datetime(until)
+        while moment < until_time and len(groups) < limit:
+            hour_ts = int(moment.replace(minute=0, second=0).timestamp())
+            statuses = self.hour_statuses(zone_id, hour_ts, minutes).get(format_datetime(moment)[:16 if minutes else 13], {})
+            requests = sum(statuses.values())
+            cached = int(requests * CACHED_RATIO)
+            groups.append({
+                "dimensions": {dimension: format_datetime(moment)},
+                "sum": {
+                    "requests": requests,
+                    "bytes": requests * BYTES_PER_REQUEST,
+                    "cachedRequests": cached,
+                    "cachedBytes": cached * BYTES_PER_REQUEST,
+                    "responseStatusMap": [
+                        {"edgeResponseStatus": status, "requests": count}
+                        for status, count in sorted(statuses.items())
+                    ],
+                },
+            })
+            moment += step
+        return groups
+
+    def event_groups(self, events, dimensions, limit, quantiles=False):
+        """按请求的维度对事件计数；datetimeHour 等时间维度由 datetime 推导。"""
+        def dimension_value(event, dimension):
+            if dimension == "datetimeHour":
+                return event["datetime"][:13] + ":00:00Z"
+            if dimension == "datetimeMinute":
+                return event["datetime"][:16] + ":00Z"
+            return event.get(dimension)
+
+        counts = Counter(tuple(dimension_value(event, dimension) for dimension in dimensions) for event in events)
+        groups = []
+        for key, count in counts.most_common(limit):
+            group = {"count": count, "dimensions": dict(zip(dimensions, key))}
+            if quantiles:
+                # 回源耗时分位数按分组键生成，保证可复现
+                base = random.Random(f"{self.seed}:{key}").uniform(40, 160)
+                group["quantiles"] = {
+                    "originResponseDurationMsP50": round(base, 1),
+                    "originResponseDurationMsP95": round(base * 3.5, 1),
+                    "originResponseDurationMsP99": round(base * 8, 1),
+                }
+            groups.append(group)
+        return groups
+
+
+class MockGraphQLHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        mock = self.server.mock
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        delay = mock.latency + (random.uniform(0, mock.jitter) if mock.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+        error = mock.pick_error()
+        if (body.get("variables") or {}).get("zoneTag") in mock.error_zones:
+            error = "http_503"
+        mock.count(requests=1)
+        if error == "http_503":
+            mock.count(errors=1)
+            return self.send_json(503, {"errors": [{"message": "service unavailable"}]})
+        if error == "http_429":
+            mock.count(errors=1)
+            return self.send_json(429, {"errors": [{"message": "too many requests"}]}, {"Retry-After": "1"})
+        if error == "rate_limit":
+            mock.count(errors=1)
+            return self.send_json(200, {"data": None, "errors": [{
+                "message": "rate limiter budget depleted, try again after 1 second",
+                "extensions": {"code": "rate_limit"},
+            }]})
+        if error == GRAPHQL_ERROR:
+            mock.count(errors=1)
+            return self.send_json(200, {"data": None, "errors": [{
+                "message": "zone does not have access to the requested dataset",
+                "extensions": {"code": "authz"},
+            }]})
+
+        zone, event_count = mock.resolve(body.get("query", ""), body.get("variables") or {})
+        mock.count(events=event_count)
+        self.send_json(200, {"data": {"viewer": {"zones": [zone]}}, "errors": None})
+
+    def send_json(self, status, payload, headers=None):
+        content = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟的 Cloudflare GraphQL 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--events-per-hour", type=int, default=1000, help="每小时正常请求事件数")
+    parser.add_argument("--waf-events-per-hour", type=int, default=100, help="每小时 WAF 事件数")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个响应的固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="额外的随机延迟上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="注入错误的概率")
+    parser.add_argument("--error-kinds", default=",".join(ERROR_KINDS), help=f"可注入的错误类型，逗号分隔（另可使用 {GRAPHQL_ERROR}）")
+    parser.add_argument("--ua-variety", type=int, default=200, help="不同 UA 字符串的数量")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--recorded", help="录制的事件样本 JSON 文件: {\"ua\": [...], \"waf\": [...]}")
+    args = parser.parse_args()
+
+    recorded = None
+    if args.recorded:
+        with open(args.recorded, "r", encoding="utf-8") as f:
+            recorded = json.load(f)
+    server = MockGraphQLServer(
+        args.host, args.port,
+        events_per_hour=args.events_per_hour,
+        waf_events_per_hour=args.waf_events_per_hour,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_kinds=[kind for kind in args.error_kinds.split(",") if kind],
+        ua_variety=args.ua_variety,
+        seed=args.seed,
+        recorded=recorded,
+    )
+    print(f"模拟 GraphQL 服务已启动: {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"\n请求 {server.stats['requests']}，错误 {server.stats['errors']}，返回事件 {server.stats['events']}")
+
+
+if __name__ == "__main__":
+    main()
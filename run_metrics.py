@@ -0,0 +1,106 @@
+import cProfile
+import json
+import pstats
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+# 可选的剖析模式
+PROFILE_MODES = ("cprofile", "tracemalloc")
+# 剖析结果中保留的条目数
+PROFILE_TOP = 15
+
+
+class RunMetrics:
+    """记录一次运行的分阶段耗时与各项计数，结束时生成一条机器可读的记录。
+
+    stage() 可以在同一阶段名下多次进入，耗时累加。profile 为 cprofile 或
+    tracemalloc 时在创建时开始剖析，finish() 时停止并把热点写入记录。
+    """
+
+    def __init__(self, profile=None):
+        self.started = time.perf_counter()
+        self.stages = Counter()
+        self.values = {}
+        self.profile = profile
+        self.profiler = None
+        if profile == "cprofile":
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        elif profile == "tracemalloc":
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - started
+
+    def set(self, **values):
+        self.values.update(values)
+
+    def finish(self, profile_path=None):
+        """停止剖析并返回完整记录；cProfile 的原始数据写入 profile_path。"""
+        record = {
+            "wall_seconds": round(time.perf_counter() - self.started, 3),
+            "stages": {name: round(seconds, 3) for name, seconds in self.stages.items()},
+            **self.values,
+        }
+        if self.profiler is not None:
+            self.profiler.disable()
+            if profile_path:
+                self.profiler.dump_stats(profile_path)
+            record["profile"] = {"mode": "cprofile", "file": profile_path, "top": profile_hotspots(self.profiler)}
+        elif self.profile == "tracemalloc":
+            _, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            record["profile"] = {
+                "mode": "tracemalloc",
+                "peak_kb": peak // 1024,
+                "top": [
+                    {"location": str(stat.traceback), "size_kb": stat.size // 1024, "count": stat.count}
+                    for stat in snapshot.statistics("lineno")[:PROFILE_TOP]
+                ],
+            }
+        return record
+
+
+def profile_hotspots(profiler):
+    """按累计耗时返回 cProfile 中耗时最多的函数。"""
+    stats = pstats.Stats(profiler).stats
+    hotspots = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP]
+    return [
+        {
+            "function": f"{filename}:{line}({name})",
+            "calls": calls,
+            "own_seconds": round(own, 4),
+            "cumulative_seconds": round(cumulative, 4),
+        }
+        for (filename, line, name), (_, calls, own, cumulative, _) in hotspots
+    ]
+
+
+def summarize_queries(timings):
+    """按查询名称汇总客户端记录的请求耗时、字节数与行数。"""
+    summary = {}
+    for timing in timings:
+        item = summary.setdefault(timing["query"], {
+            "count": 0, "seconds": 0.0, "max_seconds": 0.0, "bytes": 0, "rows": 0, "retries": 0
+        })
+        item["count"] += 1
+        item["seconds"] = round(item["seconds"] + timing["seconds"], 3)
+        item["max_seconds"] = max(item["max_seconds"], timing["seconds"])
+        item["bytes"] += timing["bytes"]
+        item["rows"] += timing.get("rows", 0)
+        item["retries"] += timing.get("attempts", 1) - 1
+    return summary
+
+
+def append_jsonl(path, record):
+    """把一条记录追加到 JSON Lines 文件。"""
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
@@ -0,0 +1,105 @@
+import base64
+import math
+from hashlib import blake2b
+
+# HyperLogLog 精度：2^10 个寄存器，标准误差约 3.2%，序列化后约 1.4 KB
+HLL_PRECISION = 10
+# Space-Saving 保留的计数器数量，排行只输出其中的前若干项
+SPACE_SAVING_CAPACITY = 64
+
+
+def hash64(value):
+    """跨进程稳定的 64 位哈希（内置 hash() 每次启动都会随机化）。"""
+    return int.from_bytes(blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    """固定内存的去重计数：每个元素只影响一个寄存器，合并即逐个寄存器取最大值。"""
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.size)
+
+    def add(self, value):
+        hashed = hash64(value)
+        index = hashed >> (64 - self.precision)
+        remainder = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = 64 - self.precision - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def __bool__(self):
+        """是否加入过任何元素。"""
+        return any(self.registers)
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        """返回基数估计值，小基数时使用线性计数修正。"""
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size * self.size / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            estimate = self.size * math.log(self.size / zeros)
+        return round(estimate)
+
+    def to_state(self):
+        return base64.b64encode(bytes(self.registers)).decode("ascii")
+
+    @classmethod
+    def from_state(cls, state):
+        registers = base64.b64decode(state)
+        return cls(int(math.log2(len(registers))), registers)
+
+
+class SpaceSaving:
+    """固定容量的高频项统计（Space-Saving）：容量满时替换计数最小的项并记录其误差上界。
+
+    合并时对两侧计数求和后只保留计数最大的 capacity 项，可以逐级汇总为日、月排行。
+    """
+
+    def __init__(self, capacity=SPACE_SAVING_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+
+    def add(self, key, weight=1):
+        if key in self.counts:
+            self.counts[key] += weight
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = weight
+            self.errors[key] = 0
+        else:
+            victim = min(self.counts, key=self.counts.get)
+            floor = self.counts.pop(victim)
+            del self.errors[victim]
+            self.counts[key] = floor + weight
+            self.errors[key] = floor
+
+    def merge(self, other):
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+            self.errors[key] = self.errors.get(key, 0) + other.errors[key]
+        if len(self.counts) > self.capacity:
+            kept = sorted(self.counts, key=self.counts.get, reverse=True)[:self.capacity]
+            self.counts = {key: self.counts[key] for key in kept}
+            self.errors = {key: self.errors[key] for key in kept}
+        return self
+
+    def top(self, limit=10):
+        """返回计数最大的 limit 项 [(键, 计数)]。"""
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def to_state(self):
+        return [[key, count, self.errors[key]] for key, count in self.top(self.capacity)]
+
+    @classmethod
+    def from_state(cls, state, capacity=SPACE_SAVING_CAPACITY):
+        sketch = cls(capacity)
+        for key, count, error in state:
+            sketch.counts[key] = count
+            sketch.errors[key] = error
+        return sketch
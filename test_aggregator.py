@@ -0,0 +1,81 @@
+import unittest
+
+from aggregator import HourlyAggregator
+
+
+CHROME = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36"
+)
+GOOGLEBOT = "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)"
+
+
+class HourlyAggregatorTests(unittest.TestCase):
+    def test_single_pass_produces_all_breakdowns(self):
+        aggregator = HourlyAggregator()
+        for event in (
+            {"userAgent": CHROME, "clientCountryName": "TW"},
+            {"userAgent": GOOGLEBOT, "clientCountryName": "US"},
+            {"userAgent": "", "clientCountryName": "US"},
+        ):
+            aggregator.add_request(event)
+        aggregator.add_waf_event({"clientCountryName": "HK"})
+
+        results = aggregator.results()
+
+        self.assertEqual(results["waf_mitigated_requests"], 1)
+        self.assertEqual(
+            results["top_user_agents"],
+            [{"browser": "Chrome", "requests": 1}, {"browser": "Googlebot", "requests": 1}],
+        )
+        self.assertEqual([bot["name"] for bot in results["top_bots"]], ["Googlebot"])
+        self.assertEqual(
+            results["top_countries"],
+            [{"country": "United States", "requests": 2}, {"country": "China", "requests": 1}],
+        )
+        self.assertEqual(results["top_waf_countries"], [{"country": "China", "requests": 1}])
+
+    def test_grouped_rows_are_weighted_by_count(self):
+        aggregator = HourlyAggregator()
+        aggregator.add_request({"userAgent": CHROME, "count": 40})
+        aggregator.add_request({"clientCountryName": "CN", "count": 40})
+        aggregator.add_waf_event({"clientCountryName": "US", "count": 7})
+
+        results = aggregator.results()
+
+        self.assertEqual(results["top_user_agents"], [{"browser": "Chrome", "requests": 40}])
+        self.assertEqual(results["top_countries"], [{"country": "China", "requests": 40}])
+        self.assertEqual(results["waf_mitigated_requests"], 7)
+
+    def test_merge_combines_hours(self):
+        first, second = HourlyAggregator(), HourlyAggregator()
+        first.add_waf_event({"clientCountryName": "FR"})
+        second.add_waf_event({"clientCountryName": "FR", "count": 2})
+
+        merged = first.merge(second).results()
+
+        self.assertEqual(merged["waf_mitigated_requests"], 3)
+        self.assertEqual(merged["top_waf_countries"], [{"country": "France", "requests": 3}])
+
+    def test_user_agents_split_by_version_os_and_device(self):
+        aggregator = HourlyAggregator()
+        aggregator.add_request({"userAgent": CHROME, "count": 3})
+        aggregator.add_request({"userAgent": GOOGLEBOT})
+
+        results = aggregator.results()
+
+        self.assertEqual(results["top_browser_versions"], [{"browser": "Chrome 140", "requests": 3}])
+        self.assertEqual(
+            results["top_operating_systems"],
+            [{"os": "Windows", "requests": 3}, {"os": "Unknown", "requests": 1}],
+        )
+        self.assertEqual(
+            results["device_types"],
+            [{"device": "desktop", "requests": 3}, {"device": "bot", "requests": 1}],
+        )
+        restored = HourlyAggregator.from_record(results).merge(HourlyAggregator.from_record(results)).results()
+        self.assertEqual(restored["device_types"][0], {"device": "desktop", "requests": 6})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,369 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from collector import (
+    GROUP_LIMIT,
+    HISTORY_DB,
+    OUTPUT_FILE,
+    ZONES_DIR,
+    BatchQueue,
+    Collector,
+    ConfigError,
+    HistorySink,
+    GroupedRowStream,
+    ZoneCollection,
+    build_events_query,
+    env_settings,
+    merge_zone_records,
+    write_state,
+)
+from graphql_client import GraphQLRequestError
+from history_store import HistoryStore
+from traffic_metrics import busiest_minute_rps
+from user_agent_parser import describe_user_agent
+from mock_graphql_server import GRAPHQL_ERROR, MockGraphQLServer
+
+NOW = datetime(2026, 3, 31, 6, tzinfo=timezone.utc)
+
+
+class FakeCollection:
+    def __init__(self, name, batch_count, submitted):
+        self.batches = [f"{name}{index}" for index in range(batch_count)]
+        self.submitted = submitted
+
+    def submit_hourly_events(self, batch):
+        self.submitted.append(batch)
+        return batch
+
+
+class RecordingClient:
+    def __init__(self):
+        self.variables = []
+
+    def submit(self, query, variables):
+        self.variables.append(variables)
+
+
+class CollectorTests(unittest.TestCase):
+    def test_invalid_configuration_raises(self):
+        with self.assertRaises(ConfigError):
+            Collector("token")
+        with self.assertRaises(ConfigError):
+            Collector("token", zone_ids=["zone"], mode="unknown")
+        with mock.patch.dict(os.environ, {"RETENTION_HOURS": "a day"}), self.assertRaises(ConfigError):
+            env_settings()
+
+    def test_zone_listing_failures_are_config_errors(self):
+        with Collector("token", account_id="account") as collector:
+            with mock.patch.object(collector.client, "list_zones", side_effect=GraphQLRequestError("HTTP 403")):
+                with self.assertRaises(ConfigError):
+                    collector.list_zones()
+            with mock.patch.object(collector.client, "list_zones", return_value=[]):
+                with self.assertRaises(ConfigError):
+                    collector.list_zones()
+
+    def test_client_is_created_on_first_use(self):
+        collector = Collector("token", zone_ids=["zone"])
+
+        self.assertIsNone(collector.connection)
+        with collector:
+            self.assertIs(collector.client, collector.client)
+        self.assertIsNone(collector.connection)
+
+    def test_repeated_runs_reuse_state_in_memory(self):
+        collected = []
+
+        def sink(output_dir, results, fetched, now, generated_at):
+            collected.append((results, fetched))
+
+        with MockGraphQLServer(events_per_hour=50, waf_events_per_hour=5) as server, \
+                tempfile.TemporaryDirectory() as directory:
+            with Collector(
+                "mock", zone_ids=["zone"], retention_hours=6, rate_limit=0, url=server.url,
+                output_dir=directory, sinks=[sink], metrics_file=""
+            ) as collector:
+                first = collector.run(NOW)
+                second = collector.run(NOW)
+
+            # 没有写入状态文件，第二次运行只能复用内存中的结果
+            self.assertFalse(os.path.exists(os.path.join(directory, OUTPUT_FILE)))
+
+        self.assertEqual((first["hours_fetched"], first["hours_reused"]), (6, 0))
+        self.assertEqual((second["hours_fetched"], second["hours_reused"]), (2, 4))
+        self.assertEqual([record["since"] for record in collected[1][0]], [record["since"] for record in collected[0][0]])
+        self.assertEqual(len(collected[1][1]), 2)
+
+    def test_events_query_aliases_every_hour_and_dataset(self):
+        query = build_events_query(3, ("waf", "ua"))
+
+        for index in range(3):
+            self.assertIn(f"$since{index}: DateTime!, $until{index}: DateTime!", query)
+            self.assertIn(f"waf_{index}: firewallEventsAdaptive(", query)
+            self.assertIn(f"ua_{index}: httpRequestsAdaptive(", query)
+        self.assertNotIn("waf_3", query)
+
+    def test_batches_split_back_into_the_same_hourly_records(self):
+        collected = {}
+
+        with MockGraphQLServer(events_per_hour=40, waf_events_per_hour=8) as server:
+            runs = {}
+            for batch_hours in (1, 2):
+                def sink(output_dir, results, fetched, now, generated_at, batch_hours=batch_hours):
+                    collected[batch_hours] = results
+
+                with Collector(
+                    "mock", zone_ids=["zone"], retention_hours=5, batch_hours=batch_hours, rate_limit=0,
+                    url=server.url, sinks=[sink], metrics_file=""
+                ) as collector:
+                    runs[batch_hours] = collector.run(NOW)
+
+        self.assertEqual(runs[1]["query_summary"]["GetHourlyEvents"]["count"], 5)
+        self.assertEqual(runs[2]["query_summary"]["GetHourlyEvents"]["count"], 3)
+        self.assertEqual(len(collected[2]), 5)
+        self.assertEqual(collected[2], collected[1])
+
+    def test_only_missing_unsettled_and_failed_hours_are_fetched(self):
+        collector = Collector("token", zone_ids=["zone"], retention_hours=6, refetch_hours=2)
+        hours = collector.window(NOW)
+        starts = [int(since_time.timestamp()) for since_time, _ in hours]
+        existing = {
+            # 窗口之前的记录被淘汰
+            starts[0] - 3600: {"since": starts[0] - 3600},
+            starts[0]: {"since": starts[0]},
+            starts[2]: {"since": starts[2], "failed": True},
+            starts[3]: {"since": starts[3]},
+            # 仍在 REFETCH_HOURS 内，即使已有记录也重新获取
+            starts[5]: {"since": starts[5]},
+        }
+
+        collection = ZoneCollection(collector, "zone", "", hours, NOW, existing)
+
+        self.assertEqual(sorted(collection.records), [starts[0], starts[3]])
+        self.assertEqual(
+            [int(since_time.timestamp()) for since_time, _ in collection.missing_hours],
+            [starts[1], starts[2], starts[4], starts[5]],
+        )
+
+    def test_failed_hours_without_earlier_record_are_retried(self):
+        collected = []
+
+        def sink(output_dir, results, fetched, now, generated_at):
+            collected.append(results)
+
+        with MockGraphQLServer(events_per_hour=20, waf_events_per_hour=4, error_rate=1.0,
+                               error_kinds=["http_503"]) as server:
+            with Collector(
+                "mock", zone_ids=["zone"], retention_hours=3, max_retries=0, rate_limit=0,
+                url=server.url, sinks=[sink], metrics_file=""
+            ) as collector:
+                failed = collector.run(NOW)
+                server.error_rate = 0.0
+                retried = collector.run(NOW)
+
+        self.assertEqual((failed["hours_failed"], failed["hours_fetched"]), (3, 0))
+        self.assertEqual(collected[0], [])
+        self.assertEqual((retried["hours_failed"], retried["hours_fetched"], retried["hours_reused"]), (0, 3, 0))
+        self.assertEqual(len(collected[1]), 3)
+
+    def test_batch_queue_bounds_batches_in_flight(self):
+        submitted = []
+        queue = BatchQueue([FakeCollection("a", 3, submitted), FakeCollection("b", 2, submitted)], 2)
+
+        self.assertEqual(submitted, ["a0", "a1"])
+        consumed = []
+        for _ in range(5):
+            consumed.append(queue.next())
+            self.assertLessEqual(len(submitted) - len(consumed), 2)
+        self.assertEqual(consumed, ["a0", "a1", "a2", "b0", "b1"])
+
+    def test_groups_query_aggregates_each_dimension_separately(self):
+        query = build_events_query(2, ("waf_groups", "ua_groups", "country_groups"))
+
+        for index in range(2):
+            self.assertIn(f"waf_groups_{index}: firewallEventsAdaptiveGroups(", query)
+            self.assertIn(f"ua_groups_{index}: httpRequestsAdaptiveGroups(", query)
+            self.assertIn(f"country_groups_{index}: httpRequestsAdaptiveGroups(", query)
+        self.assertIn("orderBy: [count_DESC]", query)
+
+    def test_grouped_rows_are_truncated_at_the_group_limit(self):
+        row = {"count": 2, "dimensions": {"userAgent": "curl/8.5.0"}}
+
+        self.assertFalse(GroupedRowStream([row]).truncated)
+        self.assertTrue(GroupedRowStream([row], [row] * GROUP_LIMIT).truncated)
+        self.assertEqual(list(GroupedRowStream([row])), [{"userAgent": "curl/8.5.0", "count": 2}])
+
+    def test_groups_mode_matches_events_mode(self):
+        collected = {}
+        fields = ("total_requests", "waf_mitigated_requests", "top_countries", "top_waf_countries",
+                  "top_user_agents", "top_bots", "waf_truncated", "user_agents_truncated")
+
+        with MockGraphQLServer(events_per_hour=300, waf_events_per_hour=30, ua_variety=8) as server:
+            for mode in ("events", "groups"):
+                def sink(output_dir, results, fetched, now, generated_at, mode=mode):
+                    # 计数相同的项在两种模式下的先后顺序可能不同
+                    collected[mode] = [
+                        {
+                            field: sorted(map(str, record[field])) if isinstance(record[field], list) else record[field]
+                            for field in fields
+                        }
+                        for record in results
+                    ]
+
+                with Collector(
+                    "mock", zone_ids=["zone"], retention_hours=3, mode=mode, rate_limit=0,
+                    url=server.url, sinks=[sink], metrics_file=""
+                ) as collector:
+                    collector.run(NOW)
+
+        self.assertEqual(len(collected["groups"]), 3)
+        self.assertEqual(collected["groups"], collected["events"])
+
+    def test_multiple_zones_write_per_zone_and_account_records(self):
+        def load(*parts):
+            with open(os.path.join(*parts, OUTPUT_FILE), encoding="utf-8") as f:
+                return json.load(f)
+
+        with MockGraphQLServer(events_per_hour=30, waf_events_per_hour=5) as server, \
+                tempfile.TemporaryDirectory() as directory:
+            with Collector(
+                "mock", zone_ids=["a", "b"], retention_hours=3, refetch_hours=2, max_retries=0, rate_limit=0,
+                url=server.url, output_dir=directory, sinks=[write_state], metrics_file=""
+            ) as collector:
+                with mock.patch("collector.merge_zone_records", wraps=merge_zone_records) as merge:
+                    collector.run(NOW)
+                collections = merge.call_args.args[0]
+                zones = {zone: load(directory, ZONES_DIR, zone) for zone in ("a", "b")}
+                account = load(directory)
+
+                server.error_zones = {"b"}
+                collector.run(NOW + timedelta(hours=1))
+                failed_zone = load(directory, ZONES_DIR, "b")
+                failed_account = load(directory)
+
+        self.assertEqual(len(account), 3)
+        for index, record in enumerate(account):
+            for field in ("total_requests", "waf_mitigated_requests", "total_bytes"):
+                self.assertEqual(record[field], zones["a"][index][field] + zones["b"][index][field])
+        self.assertFalse(any(record.get("failed") for record in account))
+        # 账户级峰值由逐分钟相加的请求数得到，而不是各 Zone 峰值的最大值；分钟数据不写入记录
+        for record in account:
+            summed = [a + b for a, b in zip(*(collection.minute_requests[record["since"]] for collection in collections))]
+            self.assertEqual(record["peak_rps"], busiest_minute_rps(summed))
+        for record in account + zones["a"] + zones["b"]:
+            self.assertNotIn("minute_requests", record)
+        # 两个 Zone 都复用的小时沿用上次的账户级峰值
+        self.assertEqual(failed_account[0]["since"], account[1]["since"])
+        self.assertEqual(failed_account[0]["peak_rps"], account[1]["peak_rps"])
+
+        # b 的最近一小时重新获取失败，保留旧记录；新的一小时没有旧记录，只有账户级记录标记失败
+        self.assertEqual([record.get("failed", False) for record in failed_zone], [False, True])
+        self.assertEqual([record.get("failed", False) for record in failed_account], [False, True, True])
+
+    def test_ua_cache_stats_cover_only_the_current_run(self):
+        describe_user_agent.cache_clear()
+        with MockGraphQLServer(events_per_hour=30, waf_events_per_hour=5) as server:
+            with Collector(
+                "mock", zone_ids=["zone"], retention_hours=4, rate_limit=0, url=server.url, sinks=[], metrics_file=""
+            ) as collector:
+                first = collector.run(NOW)
+                second = collector.run(NOW)
+
+        self.assertGreater(first["ua_cache"]["misses"], 0)
+        # 第二次运行重新获取的小时与第一次相同，全部命中缓存
+        self.assertEqual(second["ua_cache"]["misses"], 0)
+        self.assertGreater(second["ua_cache"]["hits"], 0)
+        self.assertLess(second["ua_cache"]["hits"], first["ua_cache"]["hits"] + first["ua_cache"]["misses"])
+
+    def test_minute_query_is_split_under_the_group_limit(self):
+        collector = Collector("token", zone_ids=["zone"], retention_hours=200)
+        collector.connection = RecordingClient()
+        ZoneCollection(collector, "zone", "", collector.window(NOW), NOW, {}).submit()
+
+        details = [variables for variables in collector.connection.variables if "minuteLimit" in variables]
+        self.assertEqual([variables["hourLimit"] for variables in details], [166, 34])
+        self.assertTrue(all(variables["minuteLimit"] <= GROUP_LIMIT for variables in details))
+        self.assertEqual(details[0]["until"], details[1]["since"])
+
+    def test_new_history_database_is_seeded_from_state(self):
+        with MockGraphQLServer(events_per_hour=30, waf_events_per_hour=5) as server, \
+                tempfile.TemporaryDirectory() as directory:
+            with Collector(
+                "mock", zone_ids=["zone"], retention_hours=4, refetch_hours=1, rate_limit=0, url=server.url,
+                output_dir=directory, sinks=[write_state], metrics_file=""
+            ) as collector:
+                collector.run(NOW)
+            with Collector(
+                "mock", zone_ids=["zone"], retention_hours=4, refetch_hours=1, rate_limit=0, url=server.url,
+                output_dir=directory, sinks=[write_state, HistorySink()], metrics_file=""
+            ) as collector:
+                run = collector.run(NOW)
+            with HistoryStore(os.path.join(directory, HISTORY_DB)) as store:
+                stored = store.query("hour", 0, 2 ** 40)
+
+        self.assertEqual(run["hours_fetched"], 1)
+        self.assertEqual(len(stored), 4)
+
+    def test_truncated_response_bodies_mark_hours_failed(self):
+        with MockGraphQLServer(events_per_hour=30, waf_events_per_hour=5) as server, \
+                tempfile.TemporaryDirectory() as directory:
+            with Collector(
+                "mock", zone_ids=["zone"], retention_hours=4, refetch_hours=2, max_retries=0, rate_limit=0,
+                url=server.url, output_dir=directory, sinks=[write_state], metrics_file=""
+            ) as collector:
+                collector.run(NOW)
+                error = requests.exceptions.ChunkedEncodingError("Connection broken: IncompleteRead")
+                with mock.patch.object(collector.client.session, "post", side_effect=error):
+                    failed = collector.run(NOW)
+                with open(os.path.join(directory, OUTPUT_FILE), encoding="utf-8") as f:
+                    results = json.load(f)
+
+        # 运行完成并写出了状态文件：需要重新获取的两小时标记为失败，其余保留
+        self.assertEqual(failed["hours_failed"], 2)
+        self.assertEqual([record.get("failed", False) for record in results], [False, False, True, True])
+
+    def test_graphql_errors_mark_hours_failed_instead_of_storing_zeros(self):
+        with MockGraphQLServer(events_per_hour=30, waf_events_per_hour=5, error_kinds=[GRAPHQL_ERROR]) as server, \
+                tempfile.TemporaryDirectory() as directory:
+            with Collector(
+                "mock", zone_ids=["zone"], retention_hours=4, refetch_hours=2, rate_limit=0, url=server.url,
+                output_dir=directory, sinks=[write_state, HistorySink()], metrics_file=""
+            ) as collector:
+                good = collector.run(NOW)
+                with HistoryStore(os.path.join(directory, HISTORY_DB)) as store:
+                    stored = store.query("hour", 0, 2 ** 40)
+
+                server.error_rate = 1.0
+                failed = collector.run(NOW)
+                with open(os.path.join(directory, OUTPUT_FILE), encoding="utf-8") as f:
+                    results = json.load(f)
+                with HistoryStore(os.path.join(directory, HISTORY_DB)) as store:
+                    self.assertEqual(store.query("hour", 0, 2 ** 40), stored)
+
+            with tempfile.TemporaryDirectory() as empty:
+                with Collector(
+                    "mock", zone_ids=["zone"], retention_hours=4, rate_limit=0, url=server.url,
+                    output_dir=empty, sinks=[write_state, HistorySink()], metrics_file=""
+                ) as collector:
+                    first = collector.run(NOW)
+                with open(os.path.join(empty, OUTPUT_FILE), encoding="utf-8") as f:
+                    self.assertEqual(json.load(f), [])
+                with HistoryStore(os.path.join(empty, HISTORY_DB)) as store:
+                    self.assertEqual(store.query("hour", 0, 2 ** 40), [])
+
+        self.assertEqual(good["hours_failed"], 0)
+        # 最近两小时需要重新获取但失败：保留上次的结果并标记，历史库不被覆盖为 0
+        self.assertEqual((failed["hours_failed"], failed["hours_fetched"]), (2, 0))
+        self.assertEqual([record.get("failed", False) for record in results], [False, False, True, True])
+        self.assertEqual([record["total_requests"] for record in results], [record["total_requests"] for record in stored])
+        self.assertTrue(all(record["total_requests"] > 0 for record in results))
+        self.assertEqual((first["hours_failed"], first["hours_fetched"]), (4, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
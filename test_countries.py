@@ -0,0 +1,36 @@
+import unittest
+
+from countries import (
+    build_country_lookup,
+    normalize_country,
+    normalize_countries,
+    normalize_country_counts,
+)
+
+
+class CountryNormalizationTests(unittest.TestCase):
+    def test_codes_and_names_share_one_bucket(self):
+        self.assertEqual(normalize_country("FR"), "France")
+        self.assertEqual(normalize_country("France"), "France")
+        self.assertEqual(normalize_country("US"), "United States")
+
+    def test_default_merge_policy(self):
+        for value in ("TW", "HK", "MO", "Taiwan", "Hong Kong", "Macao", "CN"):
+            with self.subTest(value=value):
+                self.assertEqual(normalize_country(value), "China")
+
+    def test_custom_merge_policy(self):
+        lookup = build_country_lookup({})
+        self.assertEqual(lookup["HK"], "Hong Kong")
+
+    def test_unknown_values_pass_through(self):
+        self.assertEqual(normalize_country("Atlantis"), "Atlantis")
+        self.assertEqual(normalize_countries(["DE", None, "Atlantis"]), ["Germany", None, "Atlantis"])
+
+    def test_counts_are_merged_by_display_name(self):
+        counts = normalize_country_counts({"CN": 3, "TW": 1, "China": 2, "DE": 1})
+        self.assertEqual(counts, {"China": 6, "Germany": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
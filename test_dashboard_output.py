@@ -0,0 +1,60 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+from dashboard_output import split_records, write_dashboard
+
+
+RECORDS = [
+    {
+        "since": 0,
+        "until": 3600,
+        "total_requests": 10,
+        "total_bytes": 2048,
+        "waf_mitigated_requests": 1,
+        "top_user_agents": [{"browser": "Chrome", "requests": 8}],
+        "top_bots": [
+            {
+                "name": "Googlebot",
+                "operator": "Google",
+                "classification": "搜索引擎爬虫",
+                "signature": "Googlebot/",
+                "requests": 2,
+            }
+        ],
+        "top_countries": [{"country": "China", "requests": 10}],
+        "top_waf_countries": [],
+    }
+]
+
+
+class DashboardOutputTests(unittest.TestCase):
+    def test_split_records_into_columns(self):
+        summary, breakdowns = split_records(RECORDS)
+
+        self.assertEqual(summary["total_requests"], [10])
+        self.assertEqual(summary["waf_truncated"], [None])
+        self.assertEqual(breakdowns["columns"]["top_user_agents"], [[["Chrome", 8]]])
+        self.assertEqual(breakdowns["columns"]["top_bots"], [[["Googlebot", 2]]])
+        self.assertEqual(
+            breakdowns["bot_metadata"], {"Googlebot": ["Google", "搜索引擎爬虫", "Googlebot/"]}
+        )
+
+    def test_write_dashboard_writes_minified_and_gzip_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            prefix = os.path.join(directory, "stats")
+            paths = write_dashboard(prefix, RECORDS, generated_at=123)
+
+            with open(paths[0], "rb") as f:
+                raw = f.read()
+            with open(paths[0] + ".gz", "rb") as f:
+                self.assertEqual(gzip.decompress(f.read()), raw)
+
+        self.assertNotIn(b"\n", raw)
+        self.assertEqual(json.loads(raw)["generated_at"], 123)
+
+
+if __name__ == "__main__":
+    unittest.main()
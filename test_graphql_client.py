@@ -0,0 +1,195 @@
+import unittest
+from unittest import mock
+
+import requests
+
+from graphql_client import EventStream, GraphQLClient, GraphQLRequestError, TokenBucket, zone_result
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200, headers=None):
+        self.payload = payload
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = b"{}"
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}", response=self)
+
+    def json(self):
+        return self.payload
+
+
+class GraphQLClientTests(unittest.TestCase):
+    def test_submit_records_timing_per_query(self):
+        with GraphQLClient("token", max_workers=2) as client:
+            with mock.patch.object(client.session, "post", return_value=FakeResponse({"data": {}})):
+                futures = [client.submit("query GetZoneAnalytics { viewer }", {}) for _ in range(3)]
+                results = [future.result() for future in futures]
+
+        self.assertEqual(results, [{"data": {}}] * 3)
+        self.assertEqual([timing["query"] for timing in client.timings], ["GetZoneAnalytics"] * 3)
+
+    def test_fetch_retries_then_raises_request_error(self):
+        with GraphQLClient("token", max_retries=2) as client:
+            error = requests.ConnectionError("boom")
+            with mock.patch.object(client.session, "post", side_effect=error) as post, \
+                    mock.patch("graphql_client.time.sleep") as sleep:
+                with self.assertRaises(GraphQLRequestError):
+                    client.fetch("query Q { viewer }", {})
+
+        self.assertEqual(post.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_fetch_retries_truncated_bodies_and_wraps_the_last_failure(self):
+        error = requests.exceptions.ChunkedEncodingError("Connection broken: IncompleteRead")
+        with GraphQLClient("token", max_retries=1) as client:
+            with mock.patch.object(client.session, "post", side_effect=[error, FakeResponse({"data": {}})]), \
+                    mock.patch("graphql_client.time.sleep"):
+                self.assertEqual(client.fetch("query Q { viewer }", {}), {"data": {}})
+            with mock.patch.object(client.session, "post", side_effect=error) as post, \
+                    mock.patch("graphql_client.time.sleep"):
+                with self.assertRaises(GraphQLRequestError):
+                    client.fetch("query Q { viewer }", {})
+
+        self.assertEqual(post.call_count, 2)
+
+    def test_non_object_responses_are_retried(self):
+        responses = [FakeResponse(["unexpected"]), FakeResponse({"data": {}})]
+        with GraphQLClient("token") as client:
+            with mock.patch.object(client.session, "post", side_effect=responses), \
+                    mock.patch("graphql_client.time.sleep"):
+                self.assertEqual(client.fetch("query Q { viewer }", {}), {"data": {}})
+
+    def test_fetch_honours_retry_after_on_429(self):
+        responses = [
+            FakeResponse({}, status_code=429, headers={"Retry-After": "7"}),
+            FakeResponse({"data": {"ok": True}}),
+        ]
+        with GraphQLClient("token", backoff_base=0.01) as client:
+            with mock.patch.object(client.session, "post", side_effect=responses), \
+                    mock.patch("graphql_client.time.sleep") as sleep:
+                data = client.fetch("query Q { viewer }", {})
+
+        self.assertEqual(data, {"data": {"ok": True}})
+        self.assertEqual(sleep.call_args.args[0], 7.0)
+        self.assertEqual(client.timings[0]["attempts"], 2)
+
+    def test_fetch_retries_graphql_rate_limit_errors(self):
+        responses = [
+            FakeResponse({"data": None, "errors": [{"message": "rate limiter budget depleted",
+                                                    "extensions": {"code": "rate_limit"}}]}),
+            FakeResponse({"data": {}}),
+        ]
+        with GraphQLClient("token") as client:
+            with mock.patch.object(client.session, "post", side_effect=responses) as post, \
+                    mock.patch("graphql_client.time.sleep"):
+                self.assertEqual(client.fetch("query Q { viewer }", {}), {"data": {}})
+
+        self.assertEqual(post.call_count, 2)
+
+    def test_fetch_does_not_retry_client_errors(self):
+        with GraphQLClient("token") as client:
+            with mock.patch.object(client.session, "post", return_value=FakeResponse({}, status_code=401)) as post:
+                with self.assertRaises(GraphQLRequestError):
+                    client.fetch("query Q { viewer }", {})
+
+        self.assertEqual(post.call_count, 1)
+
+    def test_zone_result_rejects_errors_and_missing_datasets(self):
+        zone = {"waf_0": [], "ua_0": [{"userAgent": "curl/8.5.0"}]}
+
+        self.assertIs(zone_result({"data": {"viewer": {"zones": [zone]}}}, "waf_0", "ua_0"), zone)
+        for data in (
+            {"data": None, "errors": [{"message": "zone does not have access"}]},
+            {"data": {"viewer": {"zones": []}}},
+            {"data": {"viewer": {"zones": [{"waf_0": [], "ua_0": None}]}}},
+        ):
+            with self.subTest(data=data), self.assertRaises(GraphQLRequestError):
+                zone_result(data, "waf_0", "ua_0")
+
+    def test_token_bucket_waits_when_empty(self):
+        bucket = TokenBucket(rate=2, capacity=1)
+        with mock.patch("graphql_client.time.sleep") as sleep:
+            bucket.acquire()
+            sleep.side_effect = lambda seconds: setattr(bucket, "tokens", 1)
+            bucket.acquire()
+
+        self.assertEqual(sleep.call_count, 1)
+        self.assertLessEqual(sleep.call_args.args[0], 0.5)
+
+    def test_list_zones_follows_pagination(self):
+        pages = [
+            FakeResponse({"result": [{"id": "a"}, {"id": "b"}], "result_info": {"total_pages": 2}}),
+            FakeResponse({"result": [{"id": "c"}], "result_info": {"total_pages": 2}}),
+        ]
+        with GraphQLClient("token") as client:
+            with mock.patch.object(client.session, "get", side_effect=pages) as get:
+                zone_ids = client.list_zones("account")
+
+        self.assertEqual(zone_ids, ["a", "b", "c"])
+        self.assertEqual(get.call_args.kwargs["params"]["page"], 2)
+
+    def test_list_zones_is_rate_limited_and_retried(self):
+        pages = [
+            FakeResponse({}, status_code=503),
+            requests.ConnectionError("reset"),
+            FakeResponse({"result": [{"id": "a"}], "result_info": {"total_pages": 1}}),
+        ]
+        with GraphQLClient("token", rate_limit=5) as client:
+            with mock.patch.object(client.session, "get", side_effect=pages) as get, \
+                    mock.patch.object(client.bucket, "acquire") as acquire, \
+                    mock.patch("graphql_client.time.sleep"):
+                self.assertEqual(client.list_zones("account"), ["a"])
+
+        self.assertEqual(get.call_count, 3)
+        self.assertEqual(acquire.call_count, 3)
+
+    def test_list_zones_failures_raise_request_error(self):
+        for response in (FakeResponse({"success": False}, status_code=403), FakeResponse({"success": False})):
+            with GraphQLClient("token") as client:
+                with self.subTest(status=response.status_code), \
+                        mock.patch.object(client.session, "get", return_value=response), \
+                        self.assertRaises(GraphQLRequestError):
+                    client.list_zones("account")
+
+
+class EventStreamTests(unittest.TestCase):
+    def test_pages_by_datetime_cursor_without_duplicates(self):
+        first_page = [
+            {"id": 1, "datetime": "2026-03-31T05:00:01Z"},
+            {"id": 2, "datetime": "2026-03-31T05:00:02Z"},
+        ]
+        # 下一页从游标时刻（含）开始，会再次返回 id 2
+        pages = {
+            "2026-03-31T05:00:02Z": [
+                {"id": 2, "datetime": "2026-03-31T05:00:02Z"},
+                {"id": 3, "datetime": "2026-03-31T05:00:03Z"},
+            ],
+            "2026-03-31T05:00:03Z": [{"id": 3, "datetime": "2026-03-31T05:00:03Z"}],
+        }
+
+        stream = EventStream(first_page, pages.__getitem__, page_size=2, max_pages=5)
+
+        self.assertEqual([event["id"] for event in stream], [1, 2, 3])
+        self.assertEqual(stream.pages, 3)
+        self.assertFalse(stream.truncated)
+
+    def test_fetches_first_page_from_cursor_and_stops_at_page_limit(self):
+        page = [{"datetime": "2026-03-31T05:00:01Z"}, {"datetime": "2026-03-31T05:00:02Z"}]
+        cursors = []
+
+        def fetch_page(cursor):
+            cursors.append(cursor)
+            return page
+
+        stream = EventStream(None, fetch_page, page_size=2, max_pages=2, cursor="2026-03-31T05:00:00Z")
+
+        self.assertEqual(len(list(stream)), 3)
+        self.assertEqual(cursors, ["2026-03-31T05:00:00Z", "2026-03-31T05:00:02Z"])
+        self.assertTrue(stream.truncated)
+
+
+if __name__ == "__main__":
+    unittest.main()
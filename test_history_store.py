@@ -0,0 +1,105 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from aggregator import HourlyAggregator
+from history_store import HOURLY_RETENTION_HOURS, HistoryStore, settled_records
+
+
+def hour_record(since, requests, waf_country="US"):
+    return {
+        "since": since,
+        "until": since + 3600,
+        "total_requests": requests,
+        "total_bytes": requests * 1024,
+        "waf_mitigated_requests": 1,
+        "top_user_agents": [{"browser": "Chrome", "requests": requests}],
+        "top_bots": [],
+        "top_countries": [{"country": "China", "requests": requests}],
+        "top_waf_countries": [{"country": waf_country, "requests": 1}],
+    }
+
+
+DAY = int(datetime(2026, 3, 31, tzinfo=timezone.utc).timestamp())
+
+
+class HistoryStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.store = HistoryStore(":memory:")
+        self.addCleanup(self.store.close)
+
+    def test_rollups_follow_new_hours(self):
+        self.store.add_hours([hour_record(DAY, 10), hour_record(DAY + 3600, 5)])
+        self.store.add_hours([hour_record(DAY + 86400, 7)])
+
+        days = self.store.query("day", DAY, DAY + 2 * 86400)
+        months = self.store.query("month", 0, DAY + 2 * 86400)
+
+        self.assertEqual([day["total_requests"] for day in days], [15, 7])
+        self.assertEqual([month["total_requests"] for month in months], [15, 7])
+        self.assertEqual(days[0]["top_user_agents"], [{"browser": "Chrome", "requests": 15}])
+
+    def test_replacing_an_hour_updates_rollups(self):
+        self.store.add_hours([hour_record(DAY, 10)])
+        self.store.add_hours([hour_record(DAY, 12, waf_country="FR")])
+
+        day = self.store.query("day", DAY, DAY + 86400)[0]
+
+        self.assertEqual(day["total_requests"], 12)
+        self.assertEqual(day["top_waf_countries"], [{"country": "France", "requests": 1}])
+
+    def test_rollups_merge_distinct_visitor_sketches(self):
+        records = []
+        for hour in range(3):
+            aggregator = HourlyAggregator()
+            # 每小时 400 个访客，相邻小时重叠一半
+            for index in range(hour * 200, hour * 200 + 400):
+                aggregator.add_request({"clientIP": f"192.0.2.{index}", "userAgent": "curl/8.0"})
+            records.append({**hour_record(DAY + hour * 3600, 400), **aggregator.results()})
+        self.store.add_hours(records)
+
+        day = self.store.query("day", DAY, DAY + 86400)[0]
+
+        self.assertAlmostEqual(day["unique_visitors"], 800, delta=80)
+        self.assertEqual(day["unique_user_agents"], 1)
+
+    def test_views_select_granularity(self):
+        self.store.add_hours([hour_record(DAY + hour * 3600, 1) for hour in range(30)])
+        now = DAY + 30 * 3600
+
+        self.assertEqual(len(self.store.view("7d", now)), 30)
+        self.assertEqual(len(self.store.view("30d", now)), 2)
+        self.assertEqual(len(self.store.view("1y", now)), 2)
+
+    def test_old_hours_are_pruned_after_their_day_is_rolled_up(self):
+        self.store.add_hours([{**hour_record(DAY, 10), "minute_requests": [1] * 60}])
+        later = DAY + 86400 + HOURLY_RETENTION_HOURS * 3600
+        self.store.add_hours([hour_record(later, 3)])
+        # 已裁剪日期的迟到记录不能只凭它重算日汇总
+        self.store.add_hours([hour_record(DAY + 3600, 99)])
+
+        self.assertEqual([record["since"] for record in self.store.query("hour", 0, 2 ** 40)], [later])
+        self.assertEqual(self.store.query("day", DAY, DAY + 86400)[0]["total_requests"], 10)
+
+    def test_transient_fields_are_not_stored(self):
+        self.store.add_hours([{**hour_record(DAY, 10), "minute_requests": [1] * 60}])
+
+        self.assertNotIn("minute_requests", self.store.query("hour", DAY, DAY + 3600)[0])
+
+
+class SettledRecordsTests(unittest.TestCase):
+    def test_recent_and_failed_hours_are_not_settled(self):
+        now = datetime(2026, 3, 31, 6, tzinfo=timezone.utc)
+        hours = [(now - timedelta(hours=i), now - timedelta(hours=i - 1)) for i in range(4, 0, -1)]
+        starts = [int(since_time.timestamp()) for since_time, _ in hours]
+        existing = {
+            starts[0]: hour_record(starts[0], 1),
+            starts[1]: {**hour_record(starts[1], 1), "failed": True},
+            starts[3]: hour_record(starts[3], 1),
+        }
+
+        self.assertEqual(list(settled_records(existing, hours, now, 2)), [starts[0]])
+        self.assertEqual(list(settled_records(existing, hours, now + timedelta(hours=4), 2)), [starts[0], starts[3]])
+
+
+if __name__ == "__main__":
+    unittest.main()
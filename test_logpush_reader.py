@@ -0,0 +1,105 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+from logpush_reader import read_logpush_files, timestamp_seconds
+
+HOUR = 1774933200  # 2026-03-31T05:00:00Z
+CHROME = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36"
+)
+
+LINES = [
+    {"EdgeStartTimestamp": HOUR * 10 ** 9 + 5, "ClientRequestUserAgent": CHROME, "ClientCountry": "us",
+     "EdgeResponseStatus": 200, "WAFAction": "unknown", "EdgeResponseBytes": 1000, "ClientIP": "192.0.2.1"},
+    {"EdgeStartTimestamp": "2026-03-31T05:59:59Z", "ClientRequestUserAgent": CHROME, "ClientCountry": "hk",
+     "EdgeResponseStatus": 304, "WAFAction": "unknown", "EdgeResponseBytes": 200},
+    {"EdgeStartTimestamp": (HOUR + 10) * 1000, "ClientRequestUserAgent": "curl/8.5.0", "ClientCountry": "fr",
+     "EdgeResponseStatus": 403, "WAFAction": "block", "EdgeResponseBytes": 100},
+    {"EdgeStartTimestamp": HOUR + 3600, "ClientRequestUserAgent": CHROME, "ClientCountry": "us",
+     "EdgeResponseStatus": 404, "WAFAction": "unknown", "EdgeResponseBytes": 50},
+]
+
+
+class LogpushReaderTests(unittest.TestCase):
+    def write(self, directory, name, lines, compress):
+        path = os.path.join(directory, name)
+        opener = gzip.open if compress else open
+        with opener(path, "wt", encoding="utf-8") as f:
+            for line in lines:
+                f.write((line if isinstance(line, str) else json.dumps(line)) + "\n")
+        return path
+
+    def test_buckets_lines_into_hour_records(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [
+                self.write(directory, "part1.ndjson.gz", LINES[:2] + ["not json", ""], compress=True),
+                self.write(directory, "part2.ndjson", LINES[2:], compress=False),
+            ]
+            aggregator = read_logpush_files(paths)
+
+        first, second = aggregator.records()
+        self.assertEqual(aggregator.skipped, 1)
+        self.assertEqual((first["since"], first["until"]), (HOUR, HOUR + 3600))
+        self.assertEqual(first["total_requests"], 3)
+        self.assertEqual(first["total_bytes"], 1300)
+        self.assertEqual(first["status_classes"], [0, 1, 1, 1, 0])
+        self.assertEqual(first["peak_rps"], round(2 / 60, 2))
+        self.assertEqual(first["top_user_agents"], [{"browser": "Chrome", "requests": 2}])
+        self.assertEqual(
+            first["top_countries"],
+            [{"country": "United States", "requests": 1}, {"country": "China", "requests": 1}],
+        )
+        self.assertEqual(first["waf_mitigated_requests"], 1)
+        self.assertEqual(first["waf_actions"], [{"action": "block", "requests": 1}])
+        self.assertEqual(first["top_waf_countries"], [{"country": "France", "requests": 1}])
+        # 404 响应只计入总请求数，与 GraphQL 查询的状态码过滤一致
+        self.assertEqual(second["total_requests"], 1)
+        self.assertEqual(second["top_user_agents"], [])
+
+    def test_timestamp_formats_map_to_the_same_second(self):
+        for value in (HOUR + 119, (HOUR + 119) * 1000, (HOUR + 119) * 10 ** 9, "2026-03-31T05:01:59Z"):
+            with self.subTest(value=value):
+                self.assertEqual(timestamp_seconds(value), HOUR + 119)
+
+    def test_lines_with_malformed_fields_are_skipped(self):
+        malformed = [
+            {**LINES[0], "EdgeResponseBytes": "1000"},
+            {**LINES[0], "ClientCountry": 840},
+            {**LINES[0], "ClientRequestUserAgent": ["curl"]},
+            {**LINES[2], "WAFAction": {"name": "block"}},
+            {**LINES[2], "ClientASN": "AS13335"},
+            [LINES[0]],
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.write(directory, "logs.ndjson", malformed + LINES[:1], compress=False)
+            aggregator = read_logpush_files([path])
+
+        (record,) = aggregator.records()
+        self.assertEqual(aggregator.skipped, len(malformed))
+        self.assertEqual((record["total_requests"], record["total_bytes"]), (1, 1000))
+        self.assertEqual(record["waf_mitigated_requests"], 0)
+
+    def test_distinct_user_agents_are_not_kept_per_hour(self):
+        lines = [
+            {**LINES[0], "ClientRequestUserAgent": f"{CHROME} build/{i}", "ClientIP": f"192.0.2.{i}"}
+            for i in range(200)
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.write(directory, "logs.ndjson", lines, compress=False)
+            aggregator = read_logpush_files([path])
+
+        # 每个小时只保存分类后的计数与草图，不保留原始 UA 字符串
+        bucket = aggregator.hours[HOUR]["aggregator"]
+        self.assertEqual(dict(bucket.browsers), {"Chrome": 200})
+        self.assertEqual(dict(bucket.browser_versions), {"Chrome 140": 200})
+        (record,) = aggregator.records()
+        self.assertEqual(record["top_user_agents"], [{"browser": "Chrome", "requests": 200}])
+        self.assertAlmostEqual(record["unique_user_agents"], 200, delta=10)
+
+
+if __name__ == "__main__":
+    unittest.main()
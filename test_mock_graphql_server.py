@@ -0,0 +1,65 @@
+import unittest
+
+from graphql_client import GraphQLClient, GraphQLRequestError
+from mock_graphql_server import MockGraphQLServer
+from waf_analytics import WafAggregator, WafEventStream
+
+SINCE = "2026-03-31T05:00:00Z"
+UNTIL = "2026-03-31T06:00:00Z"
+
+GROUPS_QUERY = """
+query Q($zoneTag: String!, $since0: DateTime!, $until0: DateTime!) {
+  viewer {
+    zones(filter: { zoneTag: $zoneTag }) {
+      ua_groups_0: httpRequestsAdaptiveGroups(
+        limit: 10000,
+        filter: { datetime_geq: $since0, datetime_lt: $until0 }
+      ) {
+        count
+        dimensions {
+          clientCountryName
+        }
+      }
+      httpRequests1hGroups(limit: 24, filter: { datetime_geq: $since0, datetime_lt: $until0 }) {
+        dimensions { datetime }
+        sum { requests bytes }
+      }
+    }
+  }
+}
+"""
+
+
+class MockGraphQLServerTests(unittest.TestCase):
+    def test_streams_generated_waf_events_for_one_hour(self):
+        with MockGraphQLServer(waf_events_per_hour=25) as server:
+            with GraphQLClient("mock", url=server.url) as client:
+                aggregator = WafAggregator()
+                for event in WafEventStream(client, "zone", SINCE, UNTIL):
+                    aggregator.add_event(event)
+
+        self.assertEqual(aggregator.total, 25)
+        self.assertEqual(server.stats["requests"], 1)
+        self.assertEqual(server.stats["events"], 25)
+
+    def test_groups_and_traffic_are_consistent(self):
+        with MockGraphQLServer(events_per_hour=40, waf_events_per_hour=10) as server:
+            with GraphQLClient("mock", url=server.url) as client:
+                data = client.fetch(GROUPS_QUERY, {"zoneTag": "zone", "since0": SINCE, "until0": UNTIL})
+
+        zone = data["data"]["viewer"]["zones"][0]
+        self.assertEqual(sum(row["count"] for row in zone["ua_groups_0"]), 40)
+        self.assertEqual(zone["httpRequests1hGroups"][0]["dimensions"]["datetime"], SINCE)
+        self.assertEqual(zone["httpRequests1hGroups"][0]["sum"]["requests"], 50)
+
+    def test_injected_errors_surface_as_request_errors(self):
+        with MockGraphQLServer(error_rate=1.0, error_kinds=["http_503"]) as server:
+            with GraphQLClient("mock", url=server.url, max_retries=0) as client:
+                with self.assertRaises(GraphQLRequestError):
+                    client.fetch(GROUPS_QUERY, {"zoneTag": "zone", "since0": SINCE, "until0": UNTIL})
+
+        self.assertEqual(server.stats["errors"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import json
+import os
+import tempfile
+import unittest
+
+from run_metrics import RunMetrics, append_jsonl, summarize_queries
+
+
+class RunMetricsTests(unittest.TestCase):
+    def test_stages_accumulate_and_values_are_recorded(self):
+        metrics = RunMetrics()
+        for _ in range(2):
+            with metrics.stage("wait"):
+                pass
+        metrics.set(hours_fetched=3)
+
+        record = metrics.finish()
+
+        self.assertEqual(set(record["stages"]), {"wait"})
+        self.assertEqual(record["hours_fetched"], 3)
+        self.assertNotIn("profile", record)
+
+    def test_tracemalloc_profile_reports_peak(self):
+        metrics = RunMetrics("tracemalloc")
+        data = [str(index) for index in range(10000)]
+
+        record = metrics.finish()
+
+        self.assertEqual(record["profile"]["mode"], "tracemalloc")
+        self.assertGreater(record["profile"]["peak_kb"], 0)
+        self.assertTrue(data)
+
+    def test_cprofile_writes_stats_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "run.prof")
+            metrics = RunMetrics("cprofile")
+            sorted(range(1000), key=lambda value: -value)
+
+            record = metrics.finish(path)
+
+            self.assertTrue(os.path.exists(path))
+        self.assertTrue(record["profile"]["top"])
+
+    def test_query_summary_and_jsonl_output(self):
+        timings = [
+            {"query": "GetHourlyEvents", "seconds": 0.5, "bytes": 100, "rows": 10, "attempts": 1},
+            {"query": "GetHourlyEvents", "seconds": 1.5, "bytes": 300, "rows": 30, "attempts": 3},
+        ]
+        summary = summarize_queries(timings)
+
+        self.assertEqual(summary["GetHourlyEvents"], {
+            "count": 2, "seconds": 2.0, "max_seconds": 1.5, "bytes": 400, "rows": 40, "retries": 2
+        })
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metrics.jsonl")
+            append_jsonl(path, {"run": 1})
+            append_jsonl(path, {"run": 2})
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual([json.loads(line)["run"] for line in f], [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+from sketches import HyperLogLog, SpaceSaving
+
+
+class HyperLogLogTests(unittest.TestCase):
+    def test_estimate_is_close_to_distinct_count(self):
+        sketch = HyperLogLog()
+        for repeat in range(3):
+            for index in range(20000):
+                sketch.add(f"10.{index // 65536}.{index // 256 % 256}.{index % 256}")
+
+        self.assertAlmostEqual(sketch.count(), 20000, delta=20000 * 0.1)
+
+    def test_merge_counts_union_and_round_trips_state(self):
+        first, second = HyperLogLog(), HyperLogLog()
+        for index in range(3000):
+            first.add(index)
+        for index in range(1500, 4500):
+            second.add(index)
+
+        merged = HyperLogLog.from_state(first.to_state()).merge(HyperLogLog.from_state(second.to_state()))
+
+        self.assertAlmostEqual(merged.count(), 4500, delta=4500 * 0.1)
+        self.assertEqual(len(merged.registers), len(first.registers))
+
+    def test_empty_sketch(self):
+        self.assertFalse(HyperLogLog())
+        self.assertEqual(HyperLogLog().count(), 0)
+
+
+class SpaceSavingTests(unittest.TestCase):
+    def test_heavy_hitters_survive_eviction(self):
+        sketch = SpaceSaving(capacity=4)
+        for index in range(1000):
+            sketch.add("AS1")
+            if index % 2 == 0:
+                sketch.add("AS2")
+            sketch.add(f"noise{index}")
+
+        self.assertEqual([key for key, _ in sketch.top(2)], ["AS1", "AS2"])
+        self.assertLessEqual(len(sketch.counts), 4)
+
+    def test_merge_keeps_capacity(self):
+        first, second = SpaceSaving(capacity=2), SpaceSaving(capacity=2)
+        first.add("AS1", 10)
+        first.add("AS2", 3)
+        second.add("AS1", 5)
+        second.add("AS3", 4)
+
+        merged = SpaceSaving.from_state(first.to_state(), capacity=2).merge(second)
+
+        self.assertEqual(merged.top(), [("AS1", 15), ("AS3", 4)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+
+from traffic_metrics import (
+    hourly_traffic,
+    merge_traffic_fields,
+    origin_percentiles_by_hour,
+    busiest_minute_rps,
+    merge_zone_minutes,
+    minute_requests_by_hour,
+    traffic_fields,
+)
+
+HOUR = 1774933200  # 2026-03-31T05:00:00Z
+
+
+class TrafficMetricsTests(unittest.TestCase):
+    def test_hourly_groups_include_cache_and_status_classes(self):
+        traffic = hourly_traffic([{
+            "dimensions": {"datetime": "2026-03-31T05:00:00Z"},
+            "sum": {
+                "requests": 100,
+                "bytes": 4000,
+                "cachedRequests": 60,
+                "cachedBytes": 1000,
+                "responseStatusMap": [
+                    {"edgeResponseStatus": 200, "requests": 70},
+                    {"edgeResponseStatus": 304, "requests": 20},
+                    {"edgeResponseStatus": 404, "requests": 9},
+                    {"edgeResponseStatus": 502, "requests": 1},
+                ],
+            },
+        }])
+
+        fields = traffic_fields(traffic[HOUR])
+
+        self.assertEqual(fields["status_classes"], [0, 70, 20, 9, 1])
+        self.assertEqual(fields["cached_requests"], 60)
+        self.assertEqual(fields["bandwidth_saved_percent"], 25.0)
+        self.assertIsNone(fields["peak_rps"])
+
+    def test_peaks_and_percentiles_are_keyed_by_hour(self):
+        minutes = minute_requests_by_hour([
+            {"dimensions": {"datetimeMinute": "2026-03-31T05:01:00Z"}, "sum": {"requests": 120}},
+            {"dimensions": {"datetimeMinute": "2026-03-31T05:02:00Z"}, "sum": {"requests": 600}},
+            {"dimensions": {"datetimeMinute": "2026-03-31T06:00:00Z"}, "sum": {"requests": 60}},
+        ], hours=(HOUR, HOUR + 3600, HOUR + 7200))
+        peaks = {hour: busiest_minute_rps(series) for hour, series in minutes.items()}
+        origin = origin_percentiles_by_hour([{
+            "dimensions": {"datetimeHour": "2026-03-31T05:00:00Z"},
+            "quantiles": {
+                "originResponseDurationMsP50": 80.04,
+                "originResponseDurationMsP95": 300,
+                "originResponseDurationMsP99": 900,
+            },
+        }])
+
+        self.assertEqual(peaks, {HOUR: 10.0, HOUR + 3600: 1.0, HOUR + 7200: 0.0})
+        self.assertEqual(minutes[HOUR][1:3], [120, 600])
+        self.assertEqual(origin, {HOUR: [80.0, 300, 900]})
+
+    def test_merge_sums_counts_and_keeps_peak_maximum(self):
+        first = traffic_fields(
+            {"requests": 100, "bytes": 1000, "cached_requests": 50, "cached_bytes": 500, "status_classes": [0, 100, 0, 0, 0]},
+            peak_rps=2.0, origin_response_ms=[100, 200, 300]
+        )
+        second = traffic_fields(
+            {"requests": 300, "bytes": 1000, "cached_requests": 250, "cached_bytes": 0, "status_classes": [0, 290, 0, 10, 0]},
+            peak_rps=5.0, origin_response_ms=[200, 400, 600]
+        )
+
+        merged = merge_traffic_fields([first, second, {"total_requests": 0}])
+
+        self.assertEqual(merged["total_requests"], 400)
+        self.assertEqual(merged["status_classes"], [0, 390, 0, 10, 0])
+        self.assertEqual(merged["bandwidth_saved_percent"], 25.0)
+        self.assertEqual(merged["peak_rps"], 5.0)
+        # 两小时回源请求数均为 50，按请求数加权即为简单平均
+        self.assertEqual(merged["origin_response_ms"], [150.0, 300.0, 450.0])
+
+    def test_zone_peaks_are_summed_per_minute(self):
+        first = [60, 600] + [0] * 58
+        second = [600, 60] + [0] * 58
+
+        self.assertEqual(busiest_minute_rps(merge_zone_minutes([first, second])), 11.0)
+        self.assertIsNone(merge_zone_minutes([first, None]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,27 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
 import unittest
+from collections import Counter
 
-from user_agent_parser import identify_bot, process_bot_stats
+from user_agent_corpus import build_browser_corpus, build_corpus, cascade_match_browser, linear_identify_bot
+from user_agent_parser import (
+    TOKEN_BITS,
+    UserAgentReader,
+    classify_user_agent,
+    classify_user_agent_file,
+    classify_user_agents_bulk,
+    describe_user_agent,
+    fragment_pattern,
+    identify_bot,
+    match_browser,
+    process_bot_stats,
+    process_user_agent_stats,
+    scan_user_agent,
+    ua_cache_stats,
+)
 
 
 OBSERVED_BOT_USER_AGENTS = {
@@ -30,6 +51,30 @@ class UserAgentParserTests(unittest.TestCase):
             with self.subTest(expected_name=expected_name):
                 self.assertEqual(identify_bot(user_agent), expected_name)
 
+    def test_compiled_matcher_keeps_signature_priority(self):
+        self.assertEqual(identify_bot("Claude-SearchBot/1.0 ClaudeBot/1.0"), "Claude-SearchBot")
+        self.assertEqual(identify_bot("AdsBot-Google-Mobile"), "Google AdsBot Mobile")
+        self.assertEqual(identify_bot("AdsBot-Google"), "Google AdsBot")
+
+    def test_compiled_matcher_matches_linear_scan(self):
+        for user_agent in build_corpus():
+            self.assertEqual(identify_bot(user_agent), linear_identify_bot(user_agent), user_agent)
+
+    def test_classification_is_cached_per_user_agent(self):
+        describe_user_agent.cache_clear()
+        user_agent = OBSERVED_BOT_USER_AGENTS["OAI-SearchBot"]
+        events = [{"userAgent": user_agent}] * 5
+
+        process_user_agent_stats(events)
+        process_bot_stats(events)
+
+        self.assertEqual(classify_user_agent(user_agent), ("OAI-SearchBot", "OAI-SearchBot"))
+        stats = ua_cache_stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 10)
+        classify_user_agent(user_agent)
+        self.assertEqual(ua_cache_stats(since=stats), {**stats, "hits": 1, "misses": 0})
+
     def test_bot_stats_include_metadata_for_observed_bots(self):
         events = [
             {"userAgent": user_agent}
@@ -44,5 +89,123 @@ class UserAgentParserTests(unittest.TestCase):
         self.assertTrue(all(item["operator"] != "Unknown" for item in stats))
 
 
+class RuleTableTests(unittest.TestCase):
+    def test_rule_table_matches_previous_cascade(self):
+        for user_agent in build_browser_corpus():
+            ua = user_agent.lower()
+            self.assertEqual(match_browser(ua), cascade_match_browser(ua), user_agent)
+
+    def test_single_pass_scan_finds_every_token(self):
+        for user_agent in build_corpus() + build_browser_corpus():
+            ua = user_agent.lower()
+            expected = 0
+            for token, bit in TOKEN_BITS:
+                if token in ua:
+                    expected |= bit
+            self.assertEqual(scan_user_agent(ua), (linear_identify_bot(user_agent), expected), user_agent)
+
+    def test_fragment_pattern_prefers_longest_fragment(self):
+        pattern = fragment_pattern(["ab", "abcd", "chrome", "chrome/"])
+
+        self.assertEqual(pattern.findall("chrome/1 chrome abce abcd"), ["chrome/", "chrome", "ab", "abcd"])
+
+    def test_extracts_version_os_and_device(self):
+        cases = {
+            (
+                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                "(KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
+            ): ("Chrome", "126", "Windows", "desktop"),
+            (
+                "Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 "
+                "(KHTML, like Gecko) Version/17.5 Mobile/15E148 Safari/604.1"
+            ): ("Safari", "17", "iOS", "mobile"),
+            (
+                "Mozilla/5.0 (Linux; Android 14; SM-X710) AppleWebKit/537.36 "
+                "(KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36"
+            ): ("Chrome", "125", "Android", "tablet"),
+            (
+                "Mozilla/5.0 (Macintosh; Intel Mac OS X 14.5; rv:127.0) Gecko/20100101 Firefox/127.0"
+            ): ("Firefox", "127", "macOS", "desktop"),
+            "curl/8.5.0": ("cURL", "8", "Unknown", "other"),
+        }
+        for user_agent, expected in cases.items():
+            with self.subTest(user_agent=user_agent):
+                self.assertEqual(tuple(describe_user_agent(user_agent)[:4]), expected)
+
+    def test_bots_keep_os_and_report_bot_device(self):
+        info = describe_user_agent(OBSERVED_BOT_USER_AGENTS["OAI-SearchBot"])
+        self.assertEqual(info, ("OAI-SearchBot", None, "macOS", "bot", "OAI-SearchBot"))
+
+    def test_equal_results_are_interned(self):
+        first = describe_user_agent("Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0")
+        second = describe_user_agent("Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.1")
+        self.assertIs(first, second)
+
+
+
+class BulkClassificationTests(unittest.TestCase):
+    def setUp(self):
+        self.user_agents = list(OBSERVED_BOT_USER_AGENTS.values()) * 3 + ["curl/8.5.0", "", "  "]
+
+    def expected(self):
+        browsers, bots = Counter(), Counter()
+        for ua in self.user_agents:
+            if ua.strip():
+                browser, bot = classify_user_agent(ua)
+                browsers[browser] += 1
+                if bot:
+                    bots[bot] += 1
+        return browsers, bots
+
+    def test_bulk_tallies_match_per_event_classification(self):
+        self.assertEqual(classify_user_agents_bulk(self.user_agents), self.expected())
+
+    def test_bulk_tallies_match_on_full_corpus(self):
+        self.user_agents += build_corpus() + build_browser_corpus()
+        self.assertEqual(classify_user_agents_bulk(self.user_agents), self.expected())
+
+    def test_multiprocessing_path_matches_single_process(self):
+        corpus = build_corpus()
+        self.assertEqual(
+            classify_user_agents_bulk(corpus, processes=2, chunk_size=500),
+            classify_user_agents_bulk(corpus),
+        )
+
+    def test_reads_gzipped_ndjson_and_csv_exports(self):
+        with tempfile.TemporaryDirectory() as directory:
+            ndjson_path = os.path.join(directory, "logs.ndjson.gz")
+            with gzip.open(ndjson_path, "wt", encoding="utf-8") as f:
+                for ua in self.user_agents:
+                    f.write(json.dumps({"ClientRequestUserAgent": ua}) + "\n")
+            csv_path = os.path.join(directory, "logs.csv")
+            with open(csv_path, "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["ClientIP", "ClientRequestUserAgent"])
+                writer.writerows(["127.0.0.1", ua] for ua in self.user_agents)
+
+            self.assertEqual(classify_user_agent_file(ndjson_path), self.expected())
+            self.assertEqual(classify_user_agent_file(csv_path), self.expected())
+
+    def test_malformed_ndjson_lines_are_skipped_and_counted(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "logs.ndjson")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"ClientRequestUserAgent": self.user_agents[0]}) + "\n")
+                f.write('{"ClientRequestUserAgent": "trunc\n')
+                f.write(json.dumps(["not", "an", "object"]) + "\n")
+                f.write(json.dumps({"ClientRequestUserAgent": 42}) + "\n")
+                f.write(json.dumps({"ClientRequestUserAgent": ["a"]}) + "\n")
+                f.write(json.dumps({"ClientIP": "127.0.0.1"}) + "\n")
+                f.write(json.dumps({"ClientRequestUserAgent": self.user_agents[1]}) + "\n")
+
+            reader = UserAgentReader(path)
+            self.assertEqual(list(reader), [self.user_agents[0], "", self.user_agents[1]])
+            self.assertEqual(reader.skipped, 4)
+            self.assertEqual(
+                classify_user_agent_file(path),
+                classify_user_agents_bulk([self.user_agents[0], "", self.user_agents[1]]),
+            )
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+from waf_analytics import WafAggregator, summarize_records
+
+
+class WafAggregatorTests(unittest.TestCase):
+    def test_single_pass_counts_every_dimension(self):
+        aggregator = WafAggregator()
+        for event in (
+            {"action": "block", "clientCountryName": "HK", "ruleId": "r1", "source": "waf", "datetime": "2026-03-31T05:10:00Z"},
+            {"action": "block", "clientCountryName": "US", "ruleId": "r1", "source": "waf", "datetime": "2026-03-31T05:59:59Z"},
+            {"action": "managed_challenge", "clientCountryName": "US", "ruleId": "r2", "source": "firewallManaged", "datetime": "2026-03-31T06:00:00Z"},
+        ):
+            aggregator.add_event(event)
+
+        results = aggregator.results()
+
+        self.assertEqual(results["waf_mitigated_requests"], 3)
+        self.assertEqual(results["waf_actions"], [
+            {"action": "block", "requests": 2},
+            {"action": "managed_challenge", "requests": 1},
+        ])
+        self.assertEqual(results["top_waf_countries"][0], {"country": "United States", "requests": 2})
+        self.assertEqual(results["top_waf_rules"][0], {"rule": "r1", "source": "waf", "requests": 2})
+        self.assertEqual([item["requests"] for item in aggregator.hourly()], [2, 1])
+
+    def test_grouped_rows_without_datetime_skip_hour_dimension(self):
+        aggregator = WafAggregator()
+        aggregator.add_event({"action": "block", "clientCountryName": "US", "count": 7})
+
+        self.assertEqual(aggregator.total, 7)
+        self.assertEqual(aggregator.actions["block"], 7)
+        self.assertEqual(aggregator.hourly(), [])
+
+    def test_summary_is_derived_from_hour_records(self):
+        first, second = WafAggregator(), WafAggregator()
+        first.add_event({"action": "block", "clientCountryName": "FR", "ruleId": "r1", "source": "waf"})
+        second.add_event({"action": "block", "clientCountryName": "FR", "ruleId": "r1", "source": "waf", "count": 2})
+        records = [
+            {"since": 0, **first.results()},
+            {"since": 3600, **second.results()},
+        ]
+
+        summary = summarize_records(records)
+
+        self.assertEqual(summary.total, 3)
+        self.assertEqual(summary.results()["top_waf_rules"], [{"rule": "r1", "source": "waf", "requests": 3}])
+        self.assertEqual(summary.hourly(), [{"since": 0, "requests": 1}, {"since": 3600, "requests": 2}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from watch import LiveWindow, main, minute_rows
+
+MINUTE = 1774933200
+
+
+def zone_data(*minutes):
+    """生成 GetLiveTraffic 查询结果中的 Zone 数据，参数为 (分钟时间戳, 请求数, WAF 数)。"""
+    def label(timestamp):
+        return f"2026-03-31T05:{(timestamp - MINUTE) // 60:02d}:00Z"
+    return {
+        "minutes": [
+            {
+                "dimensions": {"datetimeMinute": label(timestamp)},
+                "sum": {
+                    "requests": requests,
+                    "bytes": requests * 100,
+                    "cachedRequests": requests // 2,
+                    "responseStatusMap": [{"edgeResponseStatus": 200, "requests": requests}],
+                },
+            }
+            for timestamp, requests, _ in minutes
+        ],
+        "waf": [
+            {"count": waf, "dimensions": {"datetimeMinute": label(timestamp)}}
+            for timestamp, _, waf in minutes if waf
+        ],
+    }
+
+
+class LiveWindowTests(unittest.TestCase):
+    def test_minute_rows_combine_traffic_and_waf(self):
+        rows = minute_rows(zone_data((MINUTE, 60, 3), (MINUTE + 60, 30, 0)))
+
+        self.assertEqual(sorted(rows), [MINUTE, MINUTE + 60])
+        self.assertEqual(rows[MINUTE]["requests"], 60)
+        self.assertEqual(rows[MINUTE]["cached_requests"], 30)
+        self.assertEqual(rows[MINUTE]["status_classes"], [0, 60, 0, 0, 0])
+        self.assertEqual(rows[MINUTE]["waf_mitigated_requests"], 3)
+
+    def test_only_changed_minutes_are_reported_and_cursor_advances(self):
+        window = LiveWindow(size=10)
+        now = MINUTE + 5 * 60
+        window.update("z1", minute_rows(zone_data((MINUTE + 240, 10, 0), (MINUTE + 300, 5, 0))), MINUTE + 240)
+
+        changed = window.update("z1", minute_rows(zone_data((MINUTE + 240, 10, 0), (MINUTE + 300, 8, 1))), MINUTE + 300)
+
+        self.assertEqual(changed, {MINUTE + 300})
+        self.assertEqual(window.since("z1", now), MINUTE + 300)
+        self.assertEqual(window.since("z2", now), MINUTE - 4 * 60)
+
+    def test_zones_are_summed_and_old_minutes_trimmed(self):
+        window = LiveWindow(size=2)
+        window.update("z1", minute_rows(zone_data((MINUTE, 1, 0), (MINUTE + 60, 10, 1))), MINUTE)
+        window.update("z2", minute_rows(zone_data((MINUTE + 60, 5, 2))), MINUTE)
+
+        window.trim(MINUTE + 120)
+
+        columns = window.columns(sorted(window.rows))
+        self.assertEqual(columns["minute"], [MINUTE + 60])
+        self.assertEqual(columns["requests"], [15])
+        self.assertEqual(columns["waf_mitigated_requests"], [3])
+
+    def test_flush_writes_snapshot_and_delta(self):
+        window = LiveWindow(size=10)
+        window.update("z1", minute_rows(zone_data((MINUTE, 1, 0), (MINUTE + 60, 2, 0))), MINUTE)
+
+        with tempfile.TemporaryDirectory() as directory:
+            prefix = os.path.join(directory, "live")
+            window.flush(prefix, {MINUTE + 60}, MINUTE + 60)
+            with open(f"{prefix}_window.json", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            with open(f"{prefix}_delta.json", encoding="utf-8") as f:
+                delta = json.load(f)
+
+        self.assertEqual((snapshot["seq"], delta["base_seq"]), (1, 0))
+        self.assertEqual(snapshot["columns"]["requests"], [1, 2])
+        self.assertEqual(delta["columns"]["minute"], [MINUTE + 60])
+
+
+    def test_invalid_watch_settings_exit_with_a_message(self):
+        environ = {"CLOUDFLARE_API_TOKEN": "token", "ZONE_ID": "zone", "WATCH_INTERVAL": "soon"}
+        with mock.patch.dict(os.environ, environ), mock.patch("sys.argv", ["watch.py", "--once"]), \
+                self.assertRaises(SystemExit) as raised:
+            main()
+
+        self.assertIn("WATCH_INTERVAL", str(raised.exception.code))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+from datetime import datetime, timezone
+
+# 状态码分类，小时记录中 status_classes 按此顺序保存各类请求数
+STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+# 回源耗时分位数，小时记录中 origin_response_ms 按此顺序保存
+ORIGIN_PERCENTILES = (
+    "originResponseDurationMsP50",
+    "originResponseDurationMsP95",
+    "originResponseDurationMsP99",
+)
+# 单个 httpRequests1mGroups 查询最多覆盖的小时数（每个查询最多返回 10000 个分组）
+MINUTE_QUERY_HOURS = 10000 // 60
+
+
+def parse_hour(value):
+    """把 GraphQL 返回的时间（小时或分钟粒度）转换为所在小时的起始时间戳。"""
+    moment = datetime.strptime(value[:13], "%Y-%m-%dT%H").replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def parse_minute(value):
+    """把 GraphQL 返回的分钟粒度时间转换为该分钟的起始时间戳。"""
+    moment = datetime.strptime(value[:16], "%Y-%m-%dT%H:%M").replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def status_classes(status_map):
+    """把 responseStatusMap 汇总为 [1xx, 2xx, 3xx, 4xx, 5xx] 请求数。"""
+    counts = [0] * len(STATUS_CLASSES)
+    for item in status_map:
+        index = item["edgeResponseStatus"] // 100 - 1
+        if 0 <= index < len(counts):
+            counts[index] += item["requests"]
+    return counts
+
+
+def hourly_traffic(groups):
+    """解析 httpRequests1hGroups 的分组，返回 {小时起始时间戳: 流量字段}。"""
+    traffic = {}
+    for group in groups:
+        totals = group["sum"]
+        traffic[parse_hour(group["dimensions"]["datetime"])] = {
+            "requests": totals["requests"],
+            "bytes": totals["bytes"],
+            "cached_requests": totals.get("cachedRequests", 0),
+            "cached_bytes": totals.get("cachedBytes", 0),
+            "status_classes": status_classes(totals.get("responseStatusMap") or []),
+        }
+    return traffic
+
+
+def minute_requests_by_hour(minute_groups, hours=()):
+    """由 httpRequests1mGroups 得到 {小时起始时间戳: [60 个分钟的请求数]}。
+
+    hours 为查询覆盖的小时，其中没有任何分组（没有请求）的小时补为全 0。
+    """
+    minutes = {hour: [0] * 60 for hour in hours}
+    for group in minute_groups:
+        moment = parse_minute(group["dimensions"]["datetimeMinute"])
+        hour = moment - moment % 3600
+        minutes.setdefault(hour, [0] * 60)[moment % 3600 // 60] += group["sum"]["requests"]
+    return minutes
+
+
+def busiest_minute_rps(minute_requests):
+    """返回最忙一分钟的平均每秒请求数，分钟数据未知时为 None。"""
+    return round(max(minute_requests) / 60, 2) if minute_requests else None
+
+
+def merge_zone_minutes(series):
+    """把多个 Zone 同一小时的分钟请求数逐分钟相加；任一 Zone 缺少分钟数据（None）时返回 None。"""
+    if not series or not all(series):
+        return None
+    return [sum(values) for values in zip(*series)]
+
+
+def origin_percentiles_by_hour(rows):
+    """解析按 datetimeHour 分组的自适应数据集分位数，返回 {小时: [P50, P95, P99]}。"""
+    return {
+        parse_hour(row["dimensions"]["datetimeHour"]): [
+            round(row["quantiles"][name], 1) for name in ORIGIN_PERCENTILES
+        ]
+        for row in rows
+    }
+
+
+def traffic_fields(traffic, peak_rps=None, origin_response_ms=None):
+    """生成小时记录中的流量字段，缺失的数据以 0 或 None 表示。"""
+    total_bytes = traffic.get("bytes", 0)
+    cached_bytes = traffic.get("cached_bytes", 0)
+    return {
+        "total_requests": traffic.get("requests", 0),
+        "total_bytes": total_bytes,
+        "total_megabytes": round(total_bytes / (1024 ** 2), 2),
+        "cached_requests": traffic.get("cached_requests", 0),
+        "cached_bytes": cached_bytes,
+        # 由缓存直接响应、无需回源的流量占比
+        "bandwidth_saved_percent": round(cached_bytes / total_bytes * 100, 2) if total_bytes else 0,
+        "status_classes": traffic.get("status_classes") or [0] * len(STATUS_CLASSES),
+        "peak_rps": peak_rps,
+        "origin_response_ms": origin_response_ms,
+    }
+
+
+def merge_traffic_fields(records):
+    """把若干条记录的流量字段合并为一条，用于日、月汇总与多 Zone 合并。
+
+    峰值取最大值，这只适用于不同时间段的合并；多个 Zone 同一小时的峰值需要
+    先用 merge_zone_minutes 逐分钟相加。分位数无法由分位数精确合并，按请求数加权平均作为近似。
+    """
+    traffic = {
+        "requests": 0,
+        "bytes": 0,
+        "cached_requests": 0,
+        "cached_bytes": 0,
+        "status_classes": [0] * len(STATUS_CLASSES),
+    }
+    peaks = []
+    origin_weight = 0
+    origin_sums = [0.0] * len(ORIGIN_PERCENTILES)
+    for record in records:
+        traffic["requests"] += record.get("total_requests", 0)
+        traffic["bytes"] += record.get("total_bytes", 0)
+        traffic["cached_requests"] += record.get("cached_requests", 0)
+        traffic["cached_bytes"] += record.get("cached_bytes", 0)
+        for index, count in enumerate(record.get("status_classes") or []):
+            traffic["status_classes"][index] += count
+        if record.get("peak_rps") is not None:
+            peaks.append(record["peak_rps"])
+        if record.get("origin_response_ms"):
+            weight = max(1, record.get("total_requests", 0) - record.get("cached_requests", 0))
+            origin_weight += weight
+            for index, value in enumerate(record["origin_response_ms"]):
+                origin_sums[index] += value * weight
+
+    origin = [round(total / origin_weight, 1) for total in origin_sums] if origin_weight else None
+    return traffic_fields(traffic, max(peaks) if peaks else None, origin)
@@ -0,0 +1,163 @@
+"""UA 样本语料与改写前的参考实现，供压测、模拟服务与测试共用。
+
+linear_identify_bot 与 cascade_match_browser 保留 identify_bot、match_browser
+改写前的逐条判断实现，用于在生成的语料上验证新实现的结果一致。
+"""
+import itertools
+
+from user_agent_parser import BOT_KEYWORDS, BOT_SIGNATURES
+
+BROWSER_USER_AGENTS = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/140.0.0.0 Safari/537.36 Edg/140.0.0.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+    "Version/17.4 Safari/605.1.15",
+    "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 "
+    "(KHTML, like Gecko) Version/17.4 Mobile/15E148 Safari/604.1",
+    "curl/8.5.0",
+    "",
+)
+
+# 级联实现中出现的全部子串，用于生成覆盖各种判断顺序的组合
+CASCADE_TOKENS = (
+    "go-http-client", "curl", "nginx-ssl early hints", "fasthttp", "ktor", "python", "aiohttp",
+    "restsharp", "imgproxy", "edg/", "edge/", "chrome/", "safari/", "opr/", "opera", "vivaldi",
+    "firefox/", "msie", "trident", "mobile", "chrome", "safari", "firefox",
+)
+
+# 真实流量中常见的非爬虫 UA
+REAL_USER_AGENTS = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/140.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/139.0.0.0 Safari/537.36 OPR/123.0.0.0",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/138.0.0.0 Safari/537.36 Vivaldi/7.5",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:142.0) Gecko/20100101 Firefox/142.0",
+    "Mozilla/5.0 (Windows NT 10.0; Trident/7.0; rv:11.0) like Gecko",
+    "Mozilla/4.0 (compatible; MSIE 8.0; Windows NT 6.1; Trident/4.0)",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/70.0.3538.102 Safari/537.36 Edge/18.19582",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/140.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (X11; CrOS x86_64 14541.0.0) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/139.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/140.0.0.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (Linux; Android 13; SM-X710) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/139.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Linux; Android 14; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "SamsungBrowser/25.0 Chrome/121.0.0.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/140.0.0.0 Mobile Safari/537.36 EdgA/140.0.0.0",
+    "Mozilla/5.0 (Android 14; Mobile; rv:142.0) Gecko/142.0 Firefox/142.0",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 18_6 like Mac OS X) AppleWebKit/605.1.15 "
+    "(KHTML, like Gecko) CriOS/140.0.7339.101 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 18_6 like Mac OS X) AppleWebKit/605.1.15 "
+    "(KHTML, like Gecko) FxiOS/142.0 Mobile/15E148 Safari/605.1.15",
+    "Mozilla/5.0 (iPad; CPU OS 17_7 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+    "Version/17.7 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 18_6 like Mac OS X) AppleWebKit/605.1.15 "
+    "(KHTML, like Gecko) Mobile/15E148 MicroMessenger/8.0.61",
+    "Dalvik/2.1.0 (Linux; U; Android 12; M2012K11AC Build/SKQ1.211006.001) Mobile",
+    "Go-http-client/2.0",
+    "curl/7.81.0",
+    "Python/3.12 aiohttp/3.10.5",
+    "python-requests/2.32.3",
+    "RestSharp/110.2.0.0",
+    "Ktor client",
+    "fasthttp",
+    "imgproxy/3.25.0",
+    "Nginx-SSL Early Hints",
+    "okhttp/4.12.0",
+    "Java/17.0.10",
+    "Unknown",
+)
+
+
+def linear_identify_bot(ua_string):
+    """改用组合正则之前的实现：按优先级逐条检查子串。"""
+    if not ua_string:
+        return None
+
+    ua = ua_string.lower()
+    for signatures, name in BOT_SIGNATURES:
+        if any(signature in ua for signature in signatures):
+            return name
+
+    if any(keyword in ua for keyword in BOT_KEYWORDS):
+        return "Other Bot"
+    return None
+
+
+def cascade_match_browser(ua):
+    """改用规则表之前的实现：逐条检查子串的 if/elif 级联。"""
+    # 特殊客户端
+    if 'go-http-client' in ua:
+        return "Go HTTP Client"
+    elif 'curl' in ua:
+        return "cURL"
+    elif 'nginx-ssl early hints' in ua:
+        return "Nginx Early Hints"
+    elif 'fasthttp' in ua:
+        return "FastHTTP"
+    elif 'ktor' in ua:
+        return "Ktor Client"
+    elif 'python' in ua and 'aiohttp' in ua:
+        return "Python aiohttp"
+    elif 'restsharp' in ua:
+        return "RestSharp"
+    elif 'imgproxy' in ua:
+        return "ImgProxy"
+    
+    # 浏览器识别
+    if 'edg/' in ua or 'edge/' in ua:
+        return "Microsoft Edge"
+    elif 'chrome/' in ua and 'safari/' in ua:
+        if 'opr/' in ua or 'opera' in ua:
+            return "Opera"
+        elif 'vivaldi' in ua:
+            return "Vivaldi"
+        else:
+            return "Chrome"
+    elif 'firefox/' in ua:
+        return "Firefox"
+    elif 'safari/' in ua and 'chrome/' not in ua:
+        return "Safari"
+    elif 'msie' in ua or 'trident' in ua:
+        return "Internet Explorer"
+    
+    # 移动设备浏览器
+    if 'mobile' in ua:
+        if 'chrome' in ua:
+            return "Chrome Mobile"
+        elif 'safari' in ua:
+            return "Safari Mobile"
+        elif 'firefox' in ua:
+            return "Firefox Mobile"
+        else:
+            return "Mobile Browser"
+    
+    return "Uncharted"
+
+
+def build_browser_corpus():
+    """生成真实 UA 以及级联子串三三排列的组合，覆盖级联中每一种判断顺序。"""
+    corpus = list(BROWSER_USER_AGENTS) + list(REAL_USER_AGENTS)
+    for tokens in itertools.permutations(CASCADE_TOKENS, 3):
+        corpus.append(" ".join(tokens))
+    return corpus
+
+
+def build_corpus():
+    """生成覆盖每个签名、签名两两组合以及相互重叠拼接情况的 UA 集合。"""
+    signatures = [signature for group, _ in BOT_SIGNATURES for signature in group]
+    signatures += list(BOT_KEYWORDS)
+    corpus = list(BROWSER_USER_AGENTS)
+    for signature in signatures:
+        corpus.append(f"Mozilla/5.0 (compatible; {signature.title()}/1.0; +https://example.com)")
+    for first, second in itertools.permutations(signatures, 2):
+        corpus.append(f"{first}/2.1 {second}/1.0")
+        corpus.append(first + second)
+    return corpus
@@ -1,3 +1,12 @@
+import csv
+import gzip
+import heapq
+import json
+import re
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+
 BOT_METADATA = {
     "Googlebot": ("Google", "搜索引擎爬虫", "Googlebot/"),
     "BingBot": ("Microsoft", "搜索引擎爬虫", "bingbot/"),
@@ -109,78 +118,315 @@ BOT_SIGNATURES = (
 )
 
 
+# 未命中具体签名时用于兜底识别的关键词，优先级低于 BOT_SIGNATURES 中的所有条目
+BOT_KEYWORDS = ("bot", "crawler", "spider", "scraper")
+
+
+def signatures_overlap(a, b):
+    """判断两个签名在某种对齐方式下能否在同一字符串中占用相同位置。"""
+    if a in b or b in a:
+        return True
+    # 部分重叠：一个的后缀恰好是另一个的前缀
+    return any(a.endswith(b[:size]) or b.endswith(a[:size]) for size in range(1, min(len(a), len(b))))
+
+
+# 浏览器/客户端规则表，按顺序取第一条满足的规则：(名称, 必须包含, 不能包含, 主版本号正则)。
+# 必须包含中的每一项都要出现，元组项表示其中任意一个出现即可；子串均为小写。
+# 新增类型只需在合适的位置插入一行，不增加逐条判断的分支。
+BROWSER_RULES = (
+    # 特殊客户端
+    ("Go HTTP Client", ("go-http-client",), (), r"go-http-client/(\d+)"),
+    ("cURL", ("curl",), (), r"curl/(\d+)"),
+    ("Nginx Early Hints", ("nginx-ssl early hints",), (), None),
+    ("FastHTTP", ("fasthttp",), (), None),
+    ("Ktor Client", ("ktor",), (), None),
+    ("Python aiohttp", ("python", "aiohttp"), (), r"aiohttp/(\d+)"),
+    ("RestSharp", ("restsharp",), (), r"restsharp/(\d+)"),
+    ("ImgProxy", ("imgproxy",), (), None),
+    # 浏览器
+    ("Microsoft Edge", (("edg/", "edge/"),), (), r"edge?/(\d+)"),
+    ("Opera", ("chrome/", "safari/", ("opr/", "opera")), (), r"(?:opr|opera)/(\d+)"),
+    ("Vivaldi", ("chrome/", "safari/", "vivaldi"), (), r"vivaldi/(\d+)"),
+    ("Chrome", ("chrome/", "safari/"), (), r"chrome/(\d+)"),
+    ("Firefox", ("firefox/",), (), r"firefox/(\d+)"),
+    ("Safari", ("safari/",), ("chrome/",), r"version/(\d+)"),
+    ("Internet Explorer", (("msie", "trident"),), (), r"(?:msie |rv:)(\d+)"),
+    # 移动设备浏览器
+    ("Chrome Mobile", ("mobile", "chrome"), (), r"(?:chrome|crios)/(\d+)"),
+    ("Safari Mobile", ("mobile", "safari"), (), r"version/(\d+)"),
+    ("Firefox Mobile", ("mobile", "firefox"), (), r"(?:firefox|fxios)/(\d+)"),
+    ("Mobile Browser", ("mobile",), (), None),
+)
+
+# 操作系统规则表，格式同上（没有版本号）。Android UA 同时包含 Linux，
+# iOS UA 同时包含 "like Mac OS X"，因此需要排在前面
+OS_RULES = (
+    ("Windows", ("windows",), ()),
+    ("Android", ("android",), ()),
+    ("iOS", (("iphone", "ipad", "ipod"),), ()),
+    ("macOS", (("mac os x", "macintosh"),), ()),
+    ("ChromeOS", ("cros ",), ()),
+    ("Linux", ("linux",), ()),
+)
+
+# 设备类型规则表；自动化客户端的设备类型固定为 bot
+DEVICE_RULES = (
+    ("tablet", (("ipad", "tablet"),), ()),
+    ("tablet", ("android",), ("mobile",)),
+    ("mobile", (("mobile", "iphone", "ipod", "android"),), ()),
+    ("desktop", (("windows", "macintosh", "x11", "cros "),), ()),
+)
+
+UNMATCHED_BROWSER = "Uncharted"
+UNKNOWN_OS = "Unknown"
+OTHER_DEVICE = "other"
+
+UserAgentInfo = namedtuple("UserAgentInfo", ("browser", "version", "os", "device", "bot"))
+
+
+def compile_rule_tables(*tables):
+    """把若干规则表编译为 (子串位表, 编译后的规则表...)。
+
+    所有表用到的子串各分配一位，一个 UA 只需把每个子串检查一次得到位掩码；
+    每条规则的"必须包含"编译为若干掩码（与结果相交即满足），"不能包含"
+    合并为一个掩码，版本号正则预先编译。
+    """
+    bits = {}
+
+    def mask(tokens):
+        value = 0
+        for token in (tokens,) if isinstance(tokens, str) else tokens:
+            value |= bits.setdefault(token, 1 << len(bits))
+        return value
+
+    compiled = [
+        tuple(
+            (
+                rule[0],
+                tuple(mask(group) for group in rule[1]),
+                mask(rule[2]),
+                re.compile(rule[3]) if len(rule) > 3 and rule[3] else None,
+            )
+            for rule in table
+        )
+        for table in tables
+    ]
+    return (tuple(bits.items()), *compiled)
+
+
+TOKEN_BITS, BROWSER_TABLE, OS_TABLE, DEVICE_TABLE = compile_rule_tables(BROWSER_RULES, OS_RULES, DEVICE_RULES)
+
+
+# 未识别为自动化客户端时的优先级，大于 BOT_SIGNATURES 与 BOT_KEYWORDS 的所有优先级
+NOT_A_BOT = len(BOT_SIGNATURES) + 1
+
+
+def fragment_pattern(fragments):
+    """把片段编译为按公共前缀分支的正则（前缀树），同一位置优先匹配最长的片段。
+
+    与按长度降序排列的 "a|b|c" 匹配结果相同，但每个位置只需沿前缀树检查少数字符，
+    而不是逐个尝试全部片段。
+    """
+    trie = {}
+    for fragment in fragments:
+        node = trie
+        for char in fragment:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = "|".join(branches)
+        # 片段在此结束时后续字符可选；先尝试更长的分支
+        if "" in node:
+            return f"(?:{body})?"
+        return f"(?:{body})" if len(branches) > 1 else body
+
+    return re.compile(build(trie))
+
+
+def compile_ua_matcher(bot_signatures, keywords, token_bits):
+    """把自动化客户端签名与规则子串编译为一个组合正则。
+
+    返回 (正则, 名称表, {片段: (签名优先级, 子串位掩码, 需要补查的片段)})。同一位置
+    优先命中更长的片段，命中的片段本身已隐含其中包含的签名与子串。
+    finditer 的匹配互不重叠，与命中片段部分重叠或包含它的片段可能被跳过，
+    因此为每个片段预先算出这些片段，命中后只需对它们补查一次子串。
+    """
+    names = [name for _, name in bot_signatures] + ["Other Bot"]
+    priorities = {}
+    for priority, (signatures, _) in enumerate(bot_signatures):
+        for signature in signatures:
+            priorities.setdefault(signature, priority)
+    for keyword in keywords:
+        priorities.setdefault(keyword, len(bot_signatures))
+    bits = dict(token_bits)
+
+    fragments = sorted(set(priorities) | set(bits))
+    implied = {
+        fragment: (
+            min((priority for other, priority in priorities.items() if other in fragment), default=NOT_A_BOT),
+            sum(bit for token, bit in bits.items() if token in fragment),
+        )
+        for fragment in fragments
+    }
+    entries = {
+        fragment: (
+            *implied[fragment],
+            tuple(
+                (other, *implied[other]) for other in fragments
+                if other not in fragment and signatures_overlap(fragment, other)
+            ),
+        )
+        for fragment in fragments
+    }
+    return fragment_pattern(fragments), names, entries
+
+
+@lru_cache(maxsize=None)
+def ua_matcher():
+    """第一次识别时才编译签名与规则子串（约 50ms），只导入本模块的进程不必付出这部分启动开销。"""
+    return compile_ua_matcher(BOT_SIGNATURES, BOT_KEYWORDS, TOKEN_BITS)
+
+
+@lru_cache(maxsize=4096)
+def match_plan(matched):
+    """由组合正则命中的片段集合得到 (签名优先级, 子串位掩码, 需要补查的片段)。
+
+    不同 UA 命中的片段组合很少，按集合缓存后每个 UA 只需补查少数几个子串；
+    只保留可能带来更高优先级签名或新子串的片段。
+    """
+    entries = ua_matcher()[2]
+    best = min((entries[fragment][0] for fragment in matched), default=NOT_A_BOT)
+    found = 0
+    for fragment in matched:
+        found |= entries[fragment][1]
+    candidates = {
+        other: None
+        for fragment in matched
+        for other, priority, bits in entries[fragment][2]
+        if priority < best or bits & ~found
+    }
+    return best, found, tuple(candidates)
+
+
+def scan_user_agent(ua):
+    """扫描一遍小写 UA，返回 (自动化客户端名称或 None, 规则子串位掩码)。
+
+    结果与按 BOT_SIGNATURES 顺序逐条检查签名、对每个规则子串分别检查是否出现完全一致。
+    """
+    pattern, names, entries = ua_matcher()
+    best, found, candidates = match_plan(frozenset(pattern.findall(ua)))
+    for other in candidates:
+        if other in ua:
+            priority, bits, _ = entries[other]
+            best = min(best, priority)
+            found |= bits
+    return (names[best] if best < NOT_A_BOT else None), found
+
+
 def identify_bot(ua_string):
     """返回自动化客户端的规范名称，无法识别时返回 None。"""
     if not ua_string:
         return None
+    return scan_user_agent(ua_string.lower())[0]
 
-    ua = ua_string.lower()
-    for signatures, name in BOT_SIGNATURES:
-        if any(signature in ua for signature in signatures):
-            return name
 
-    if any(keyword in ua for keyword in ("bot", "crawler", "spider", "scraper")):
-        return "Other Bot"
+def first_rule(table, found):
+    """返回规则表中第一条被 found 满足的规则，没有时返回 None。"""
+    for rule in table:
+        if not found & rule[2] and all(found & group for group in rule[1]):
+            return rule
     return None
 
 
-def parse_user_agent(ua_string):
-    """解析User-Agent字符串，返回浏览器类型"""
+@lru_cache(maxsize=4096)
+def resolve_tokens(found):
+    """由子串位掩码得到 (浏览器规则, 操作系统, 设备类型)。
+
+    不同 UA 命中的子串组合只有几十种，按掩码缓存后每个 UA 只需扫描一次子串，
+    三张规则表的匹配基本只是一次字典查找。
+    """
+    os_rule = first_rule(OS_TABLE, found)
+    device_rule = first_rule(DEVICE_TABLE, found)
+    return (
+        first_rule(BROWSER_TABLE, found),
+        os_rule[0] if os_rule else UNKNOWN_OS,
+        device_rule[0] if device_rule else OTHER_DEVICE,
+    )
+
+
+@lru_cache(maxsize=4096)
+def browser_name(found):
+    """由子串位掩码得到浏览器或客户端类型，只匹配浏览器规则表。"""
+    rule = first_rule(BROWSER_TABLE, found)
+    return rule[0] if rule else UNMATCHED_BROWSER
+
+
+def match_browser(ua):
+    """根据小写的非爬虫 UA 判断浏览器或客户端类型"""
+    return browser_name(scan_user_agent(ua)[1])
+
+
+# 分类缓存容量；真实流量中重复出现的 UA 通常只有几百种
+UA_CACHE_SIZE = 4096
+UNKNOWN_USER_AGENT = UserAgentInfo("Unknown", None, UNKNOWN_OS, OTHER_DEVICE, None)
+# 相同的解析结果共用同一个对象，不同 UA 字符串很多时缓存只保存引用
+interned_results = {}
+
+
+@lru_cache(maxsize=UA_CACHE_SIZE)
+def describe_user_agent(ua_string):
+    """一次解析得到 UserAgentInfo(浏览器, 主版本号, 操作系统, 设备类型, 自动化客户端名称)，按原始 UA 缓存。
+
+    自动化客户端的浏览器字段为其名称、设备类型为 bot；无法识别的版本号为 None。
+    """
     if not ua_string or ua_string == "Unknown":
-        return "Unknown"
-    
+        return UNKNOWN_USER_AGENT
+
     ua = ua_string.lower()
-    identified_bot = identify_bot(ua_string)
-    if identified_bot:
-        return identified_bot
-    
-    # 特殊客户端
-    if 'go-http-client' in ua:
-        return "Go HTTP Client"
-    elif 'curl' in ua:
-        return "cURL"
-    elif 'nginx-ssl early hints' in ua:
-        return "Nginx Early Hints"
-    elif 'fasthttp' in ua:
-        return "FastHTTP"
-    elif 'ktor' in ua:
-        return "Ktor Client"
-    elif 'python' in ua and 'aiohttp' in ua:
-        return "Python aiohttp"
-    elif 'restsharp' in ua:
-        return "RestSharp"
-    elif 'imgproxy' in ua:
-        return "ImgProxy"
-    
-    # 浏览器识别
-    if 'edg/' in ua or 'edge/' in ua:
-        return "Microsoft Edge"
-    elif 'chrome/' in ua and 'safari/' in ua:
-        if 'opr/' in ua or 'opera' in ua:
-            return "Opera"
-        elif 'vivaldi' in ua:
-            return "Vivaldi"
-        else:
-            return "Chrome"
-    elif 'firefox/' in ua:
-        return "Firefox"
-    elif 'safari/' in ua and 'chrome/' not in ua:
-        return "Safari"
-    elif 'msie' in ua or 'trident' in ua:
-        return "Internet Explorer"
-    
-    # 移动设备浏览器
-    if 'mobile' in ua:
-        if 'chrome' in ua:
-            return "Chrome Mobile"
-        elif 'safari' in ua:
-            return "Safari Mobile"
-        elif 'firefox' in ua:
-            return "Firefox Mobile"
-        else:
-            return "Mobile Browser"
-    
-    return "Uncharted"
+    bot, found = scan_user_agent(ua)
+    rule, os_name, device = resolve_tokens(found)
+    if bot:
+        info = UserAgentInfo(bot, None, os_name, "bot", bot)
+    else:
+        match = rule[3].search(ua) if rule and rule[3] else None
+        info = UserAgentInfo(
+            rule[0] if rule else UNMATCHED_BROWSER,
+            match.group(1) if match else None,
+            os_name,
+            device,
+            None,
+        )
+    return interned_results.setdefault(info, info)
+
+
+def classify_user_agent(ua_string):
+    """返回 (浏览器类型, 自动化客户端名称或 None)，结果来自 describe_user_agent 的缓存。"""
+    info = describe_user_agent(ua_string)
+    return info.browser, info.bot
+
+
+def ua_cache_stats(since=None):
+    """返回分类缓存的命中、未命中次数与当前大小。
+
+    since 为之前某次调用的结果时，命中与未命中只计算那之后的部分。
+    """
+    info = describe_user_agent.cache_info()
+    since = since or {"hits": 0, "misses": 0}
+    return {
+        "hits": info.hits - since["hits"],
+        "misses": info.misses - since["misses"],
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+    }
+
+
+def parse_user_agent(ua_string):
+    """解析User-Agent字符串，返回浏览器类型"""
+    return classify_user_agent(ua_string)[0]
 
 
 def process_user_agent_stats(user_agent_events):
@@ -192,16 +438,21 @@ def process_user_agent_stats(user_agent_events):
         if not ua or ua.strip() == "":
             continue
             
-        browser = parse_user_agent(ua)
+        browser, _ = classify_user_agent(ua)
         browser_counts[browser] = browser_counts.get(browser, 0) + 1
     
+    return format_user_agent_stats(browser_counts)
+
+
+def format_user_agent_stats(browser_counts):
+    """把浏览器计数整理为前10个最常见浏览器的列表"""
     # 按出现次数排序并取前10个
     top_user_agents = [
         {
             "browser": browser,
             "requests": count
         }
-        for browser, count in sorted(browser_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+        for browser, count in heapq.nlargest(10, browser_counts.items(), key=lambda x: x[1])
     ]
     
     return top_user_agents
@@ -216,10 +467,15 @@ def process_bot_stats(user_agent_events):
         if not ua or ua.strip() == "":
             continue
 
-        name = identify_bot(ua)
+        _, name = classify_user_agent(ua)
         if name:
             bot_counts[name] = bot_counts.get(name, 0) + 1
 
+    return format_bot_stats(bot_counts)
+
+
+def format_bot_stats(bot_counts):
+    """把自动化客户端计数整理为带元数据的完整排行。"""
     return [
         {
             "name": name,
@@ -230,3 +486,120 @@ def process_bot_stats(user_agent_events):
         }
         for name, count in sorted(bot_counts.items(), key=lambda item: item[1], reverse=True)
     ]
+
+
+# Logpush 导出中 UA 字段的默认名称
+USER_AGENT_FIELD = "ClientRequestUserAgent"
+# 多进程分类时每个任务包含的不同 UA 数量
+BULK_CHUNK_SIZE = 20000
+
+
+class UserAgentReader:
+    """逐行读取文件中的 UA 字符串，支持 .gz 压缩。
+
+    .csv 读取 field 列，.ndjson/.jsonl/.json 读取每行对象的 field 字段，
+    其他文件视为每行一个 UA 的纯文本。NDJSON 中无法解析的行、不是对象的行
+    以及 field 不是字符串的行跳过，计入 skipped，不会中断整个文件。
+    """
+
+    def __init__(self, path, field=USER_AGENT_FIELD):
+        self.path = path
+        self.field = field
+        self.skipped = 0
+
+    def __iter__(self):
+        name = self.path[:-3] if self.path.endswith(".gz") else self.path
+        opener = gzip.open if self.path.endswith(".gz") else open
+        with opener(self.path, "rt", encoding="utf-8", errors="replace", newline="") as f:
+            if name.endswith(".csv"):
+                for row in csv.DictReader(f):
+                    yield row.get(self.field) or ""
+            elif name.endswith((".ndjson", ".jsonl", ".json")):
+                for line in f:
+                    if line.strip():
+                        value = self.parse_line(line)
+                        if value is None:
+                            self.skipped += 1
+                        else:
+                            yield value
+            else:
+                for line in f:
+                    yield line.rstrip("\r\n")
+
+    def parse_line(self, line):
+        """返回一行 NDJSON 中的 UA（缺失时为空字符串），格式不符时返回 None。"""
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(record, dict):
+            return None
+        value = record.get(self.field)
+        if value is None:
+            return ""
+        return value if isinstance(value, str) else None
+
+
+def read_user_agents(path, field=USER_AGENT_FIELD):
+    """逐行读取文件中的 UA 字符串，格式见 UserAgentReader；需要跳过的行数时直接使用 UserAgentReader。"""
+    return iter(UserAgentReader(path, field))
+
+
+def count_user_agents(user_agents):
+    """统计每个不同 UA 出现的次数，空白 UA 不计入。"""
+    counts = Counter(user_agents)
+    for ua in [ua for ua in counts if not ua or not ua.strip()]:
+        del counts[ua]
+    return counts
+
+
+def tally_user_agents(counts):
+    """对去重后的 UA 逐个分类一次，按出现次数累计为 (浏览器计数, Bot 计数)。
+
+    只需要浏览器与自动化客户端：每个 UA 扫描一遍，不解析版本号、操作系统与设备类型，
+    也不经过 describe_user_agent 的缓存（批量输入的不同 UA 通常远多于缓存容量）。
+    """
+    browsers, bots = Counter(), Counter()
+    for ua, count in counts.items():
+        if not ua or ua == "Unknown":
+            browsers[UNKNOWN_USER_AGENT.browser] += count
+            continue
+        bot, found = scan_user_agent(ua.lower())
+        if bot:
+            browsers[bot] += count
+            bots[bot] += count
+        else:
+            browsers[browser_name(found)] += count
+    return browsers, bots
+
+
+def classify_user_agents_bulk(user_agents, processes=1, chunk_size=BULK_CHUNK_SIZE):
+    """批量分类任意可迭代的 UA 字符串，返回 (浏览器计数, Bot 计数)。
+
+    先去重计数，每个不同的 UA 只分类一次；processes 大于 1 且不同 UA 足够多时，
+    把去重结果分块交给进程池并行分类后合并。结果可直接传给
+    format_user_agent_stats 与 format_bot_stats。
+    """
+    counts = count_user_agents(user_agents)
+    if processes <= 1 or len(counts) <= chunk_size:
+        return tally_user_agents(counts)
+
+    # 只有并行分类时才需要进程池
+    import multiprocessing
+    items = list(counts.items())
+    chunks = [dict(items[start:start + chunk_size]) for start in range(0, len(items), chunk_size)]
+    browsers, bots = Counter(), Counter()
+    with multiprocessing.Pool(processes) as pool:
+        for chunk_browsers, chunk_bots in pool.imap_unordered(tally_user_agents, chunks):
+            browsers.update(chunk_browsers)
+            bots.update(chunk_bots)
+    return browsers, bots
+
+
+def classify_user_agent_file(path, field=USER_AGENT_FIELD, processes=1):
+    """读取导出的日志文件并批量分类其中的 UA，返回 (浏览器计数, Bot 计数)。"""
+    reader = UserAgentReader(path, field)
+    result = classify_user_agents_bulk(reader, processes=processes)
+    if reader.skipped:
+        print(f"{path}: 跳过 {reader.skipped} 行格式不符的记录")
+    return result
@@ -1,66 +1,97 @@
-import requests
+"""输出过去 24 小时的 WAF 缓解统计（按动作、国家、规则、来源 ASN、小时）。
+
+优先复用 get.py 写入的增量缓存（单 Zone 时为该 Zone，多 Zone 时为账户级汇总），
+已定稿的小时直接使用缓存中的统计，只有缺失、仍可能变化或上次失败的小时才下载事件。
+配置与 get.py 相同（见 collector.env_settings），只设置 ACCOUNT_ID 时统计账户下的全部 Zone。
+"""
 from datetime import datetime, timedelta, timezone
-import os
+import sys
 
-# 替换为您的 API Token 和 Zone ID
-API_TOKEN = os.getenv('CLOUDFLARE_API_TOKEN')
-ZONE_ID = os.getenv('ZONE_ID')
+from collector import OUTPUT_FILE, Collector, ConfigError, env_settings
+from graphql_client import GraphQLRequestError
+from history_store import load_existing_records, settled_records
+from waf_analytics import WafAggregator, WafEventStream, summarize_records
 
-# 设置请求头
-headers = {
-    "Authorization": f"Bearer {API_TOKEN}",
-    "Content-Type": "application/json"
-}
+WINDOW_HOURS = 24
 
-# 计算时间范围：过去 24 小时
-now = datetime.now(timezone.utc)
-start_time = now - timedelta(hours=24)
-since = start_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-until = now.strftime("%Y-%m-%dT%H:%M:%SZ")
 
-# 定义 GraphQL 查询
-query = """
-query GetWAFMitigatedRequests($zoneTag: String!, $since: DateTime!, $until: DateTime!) {
-  viewer {
-    zones(filter: { zoneTag: $zoneTag }) {
-      firewallEventsAdaptive(
-        filter: {
-          datetime_geq: $since,
-          datetime_lt: $until,
-          action_in: ["block", "challenge", "jschallenge", "managed_challenge", "managed_block"]
-        }
-        limit: 10000
-      ) {
-        action
-        datetime
-      }
-    }
-  }
-}
-"""
+def fetch_missing_hours(collector, missing_hours, waf):
+    """下载缺失小时的 WAF 事件并合并进 waf，返回 (截断的小时数, 失败的小时数)。"""
+    truncated = failed = 0
+    for zone_id in collector.list_zones():
+        for since_time, until_time in missing_hours:
+            stream = WafEventStream(
+                collector.client,
+                zone_id,
+                since_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                until_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                max_pages=collector.max_pages
+            )
+            hour = WafAggregator()
+            try:
+                for event in stream:
+                    hour.add_event(event)
+            except GraphQLRequestError as e:
+                print(f"{zone_id} {since_time:%Y-%m-%d %H:00} 获取失败: {e}")
+                failed += 1
+                continue
+            truncated += stream.truncated
+            waf.merge(hour)
+    return truncated, failed
+
+
+def print_results(waf):
+    results = waf.results()
+    if results["unique_waf_ips"] is not None:
+        print(f"来源 IP 约 {results['unique_waf_ips']} 个")
+    print("按动作：")
+    for item in results["waf_actions"]:
+        print(f"  {item['action']}: {item['requests']}")
+    print("按国家/地区：")
+    for item in results["top_waf_countries"][:10]:
+        print(f"  {item['country']}: {item['requests']}")
+    print("按规则：")
+    for item in results["top_waf_rules"]:
+        print(f"  {item['source']} {item['rule']}: {item['requests']}")
+    print("按来源 ASN（近似）：")
+    for item in results["top_waf_asns"]:
+        print(f"  AS{item['asn']}: {item['requests']}")
+    print("按小时：")
+    for item in waf.hourly():
+        print(f"  {datetime.fromtimestamp(item['since'], timezone.utc):%Y-%m-%d %H:00}: {item['requests']}")
+
 
-# 设置查询变量
-variables = {
-    "zoneTag": ZONE_ID,
-    "since": since,
-    "until": until
-}
+def main():
+    try:
+        settings = env_settings()
+    except ConfigError as e:
+        sys.exit(str(e))
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    hours = [(now - timedelta(hours=i), now - timedelta(hours=i - 1)) for i in range(WINDOW_HOURS, 0, -1)]
 
-# 发送请求
-response = requests.post(
-    url="https://api.cloudflare.com/client/v4/graphql",
-    headers=headers,
-    json={"query": query, "variables": variables}
-)
+    # 与 get.py 使用同一条定稿规则
+    cached = settled_records(load_existing_records(OUTPUT_FILE), hours, now, max(1, settings["refetch_hours"]))
+    missing_hours = [(since_time, until_time) for since_time, until_time in hours if int(since_time.timestamp()) not in cached]
 
-# 处理响应
-if response.status_code != 200:
-    raise Exception(f"请求失败，状态码：{response.status_code}，响应内容：{response.text}")
+    waf = summarize_records(cached.values())
+    truncated = failed = 0
+    if missing_hours:
+        try:
+            collector = Collector(**settings)
+        except ConfigError as e:
+            sys.exit(str(e))
+        with collector:
+            try:
+                truncated, failed = fetch_missing_hours(collector, missing_hours, waf)
+            except ConfigError as e:
+                sys.exit(str(e))
 
-data = response.json()
+    print(f"复用缓存 {len(cached)} 小时，下载 {len(missing_hours)} 小时")
+    print(f"过去 {WINDOW_HOURS} 小时通过 WAF 缓解的请求数：{waf.total}")
+    if truncated or failed:
+        print(f"（{truncated} 小时因事件过多被截断，{failed} 小时获取失败，实际数量可能更多）")
+    print_results(waf)
 
-# 计算 WAF 缓解请求数量
-firewall_events = data["data"]["viewer"]["zones"][0]["firewallEventsAdaptive"]
-waf_mitigated_requests = len(firewall_events)
 
-print(f"过去 24 小时通过 WAF 缓解的请求数：{waf_mitigated_requests}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+from collections import Counter
+from datetime import datetime, timezone
+from functools import lru_cache
+import json
+
+from countries import normalize_country_counts
+from graphql_client import EventStream, zone_result
+from sketches import HyperLogLog, SpaceSaving
+
+# 计入 WAF 缓解的动作
+WAF_ACTIONS = ["block", "challenge", "jschallenge", "managed_challenge", "managed_block"]
+WAF_PAGE_SIZE = 10000
+# 小时记录中保留的规则数量
+TOP_WAF_RULES = 10
+# 小时记录中保留的来源 ASN 数量
+TOP_WAF_ASNS = 10
+
+waf_events_block = """
+      {dataset}_{index}: firewallEventsAdaptive(
+        filter: {{
+          datetime_geq: $since{index},
+          datetime_lt: $until{index},
+          action_in: {actions}
+        }}
+        limit: {limit}
+        orderBy: [datetime_ASC]
+      ) {{
+        action
+        datetime
+        clientCountryName
+        clientIP
+        clientAsn
+        ruleId
+        source
+      }}""".replace("{actions}", json.dumps(WAF_ACTIONS))
+
+waf_groups_block = """
+      {dataset}_{index}: firewallEventsAdaptiveGroups(
+        filter: {{
+          datetime_geq: $since{index},
+          datetime_lt: $until{index},
+          action_in: {actions}
+        }}
+        limit: {limit}
+        orderBy: [count_DESC]
+      ) {{
+        count
+        dimensions {{
+          action
+          clientCountryName
+          ruleId
+          source
+        }}
+      }}""".replace("{actions}", json.dumps(WAF_ACTIONS))
+
+# 单独分页查询一个时间段的 WAF 事件
+waf_events_query = (
+    "query GetWAFMitigatedRequests($zoneTag: String!, $since0: DateTime!, $until0: DateTime!) {\n"
+    "  viewer {\n"
+    "    zones(filter: { zoneTag: $zoneTag }) {"
+    f"{waf_events_block.format(dataset='waf', index=0, limit=WAF_PAGE_SIZE)}\n"
+    "    }\n"
+    "  }\n"
+    "}\n"
+)
+
+
+@lru_cache(maxsize=1024)
+def hour_start(prefix):
+    """把 datetime 的前 13 个字符（YYYY-MM-DDTHH）转换为该小时起始时间戳。"""
+    return int(datetime.strptime(prefix, "%Y-%m-%dT%H").replace(tzinfo=timezone.utc).timestamp())
+
+
+class WafAggregator:
+    """逐条接收 WAF 事件，一次遍历同时按动作、国家、规则和小时计数。
+
+    与 HourlyAggregator 一样接受原始事件或带 count 的分组行，缺失的维度不参与
+    对应的统计。聚合器可以从已输出的记录恢复并相互合并，因此较长窗口的统计
+    可以直接由已采集的小时记录得到，无需重新下载事件。
+    来源 IP 的去重数与 ASN 排行用固定大小的草图统计（见 sketches.py），
+    草图状态写入记录的 waf_sketches 字段，合并时不需要原始 IP 或 ASN 列表。
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.actions = Counter()
+        self.countries = Counter()
+        self.rules = Counter()
+        self.hours = Counter()
+        self.ips = HyperLogLog()
+        self.asns = SpaceSaving()
+
+    @classmethod
+    def from_record(cls, record):
+        """从小时（或汇总）记录恢复计数，记录的 since 作为小时维度的键。"""
+        aggregator = cls()
+        aggregator.total = record.get("waf_mitigated_requests", 0)
+        for item in record.get("waf_actions", []):
+            aggregator.actions[item["action"]] += item["requests"]
+        for item in record.get("top_waf_countries", []):
+            aggregator.countries[item["country"]] += item["requests"]
+        for item in record.get("top_waf_rules", []):
+            aggregator.rules[(item["source"], item["rule"])] += item["requests"]
+        if "since" in record:
+            aggregator.hours[record["since"]] += aggregator.total
+        sketches = record.get("waf_sketches") or {}
+        if "ips" in sketches:
+            aggregator.ips = HyperLogLog.from_state(sketches["ips"])
+        if "asns" in sketches:
+            aggregator.asns = SpaceSaving.from_state(sketches["asns"])
+        return aggregator
+
+    def add_event(self, event):
+        """累计一条 WAF 缓解事件（或一个事件分组）。"""
+        weight = event.get("count", 1)
+        self.total += weight
+        self.countries[event.get("clientCountryName", "Unknown")] += weight
+        if "action" in event:
+            self.actions[event["action"]] += weight
+        if "ruleId" in event:
+            self.rules[(event.get("source") or "", event["ruleId"] or "")] += weight
+        if event.get("datetime"):
+            self.hours[hour_start(event["datetime"][:13])] += weight
+        if event.get("clientIP"):
+            self.ips.add(event["clientIP"])
+        if event.get("clientAsn"):
+            self.asns.add(str(event["clientAsn"]), weight)
+
+    def merge(self, other):
+        self.total += other.total
+        self.actions.update(other.actions)
+        self.countries.update(other.countries)
+        self.rules.update(other.rules)
+        self.hours.update(other.hours)
+        self.ips.merge(other.ips)
+        self.asns.merge(other.asns)
+        return self
+
+    def results(self):
+        """返回写入小时记录的 WAF 字段。"""
+        return {
+            "waf_mitigated_requests": self.total,
+            "top_waf_countries": [
+                {"country": country, "requests": count}
+                for country, count in Counter(normalize_country_counts(self.countries)).most_common()
+            ],
+            "waf_actions": [
+                {"action": action, "requests": count}
+                for action, count in self.actions.most_common()
+            ],
+            "top_waf_rules": [
+                {"rule": rule, "source": source, "requests": count}
+                for (source, rule), count in self.rules.most_common(TOP_WAF_RULES)
+            ],
+            # 没有 IP 维度（如分组模式）时为 None，而不是 0
+            "unique_waf_ips": self.ips.count() if self.ips else None,
+            "top_waf_asns": [
+                {"asn": asn, "requests": count}
+                for asn, count in self.asns.top(TOP_WAF_ASNS)
+            ],
+            "waf_sketches": {
+                **({"ips": self.ips.to_state()} if self.ips else {}),
+                **({"asns": self.asns.to_state()} if self.asns.counts else {}),
+            },
+        }
+
+    def hourly(self):
+        """按时间升序返回每小时的缓解请求数。"""
+        return [{"since": since, "requests": count} for since, count in sorted(self.hours.items())]
+
+
+def summarize_records(records):
+    """把若干条小时记录的 WAF 统计合并为一个聚合器。"""
+    aggregator = WafAggregator()
+    for record in records:
+        aggregator.merge(WafAggregator.from_record(record))
+    return aggregator
+
+
+class WafEventStream(EventStream):
+    """单独分页获取 [since, until) 内的 WAF 事件，用于补齐缓存中缺失的小时。"""
+
+    def __init__(self, client, zone_id, since, until, max_pages=20):
+        super().__init__(None, self.fetch_window_page, WAF_PAGE_SIZE, max_pages, cursor=since)
+        self.client = client
+        self.zone_id = zone_id
+        self.until = until
+
+    def fetch_window_page(self, cursor):
+        data = self.client.fetch(waf_events_query, {
+            "zoneTag": self.zone_id,
+            "since0": cursor,
+            "until0": self.until
+        })
+        return zone_result(data, "waf_0")["waf_0"]
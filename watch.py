@@ -0,0 +1,237 @@
+"""常驻运行的分钟级实时监控，用于在事件发生期间补充每小时一次的 get.py。
+
+每隔 WATCH_INTERVAL 秒查询一次 httpRequests1mGroups 与按分钟分组的 WAF 缓解事件，
+只查询上次轮询以来的增量：已稳定的分钟不再重复获取，最近 WATCH_SETTLE_MINUTES
+分钟的数据可能仍在补齐，下次轮询会重新获取并覆盖。结果保存在内存中最近
+WATCH_WINDOW_MINUTES 分钟的滚动窗口里，每次有变化时写出两个小文件供 index.html 轮询：
+
+  cloudflare_live_window.json  滚动窗口的完整快照（列式）
+  cloudflare_live_delta.json   本次轮询变化的分钟；base_seq 等于页面已有快照的 seq 时可直接合并
+
+连接配置（CLOUDFLARE_API_TOKEN、ZONE_ID/ACCOUNT_ID、GRAPHQL_*）与 get.py 相同，见 collector.env_settings。
+
+用法: python watch.py [--once]
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timezone
+
+from collector import Collector, ConfigError, env_number, env_settings
+from dashboard_output import write_json
+from graphql_client import GraphQLRequestError, zone_result
+from traffic_metrics import STATUS_CLASSES, parse_minute, status_classes
+from waf_analytics import WAF_ACTIONS
+
+# 以下为默认值，main() 中可由同名环境变量覆盖
+# 两次轮询之间的秒数
+WATCH_INTERVAL = 30.0
+# 内存中保留、写入快照的分钟数
+WATCH_WINDOW_MINUTES = 60
+# 最近若干分钟的数据可能仍在补齐，每次轮询都会重新获取
+WATCH_SETTLE_MINUTES = 5
+LIVE_PREFIX = "cloudflare_live"
+MINUTE_LIMIT = 10000
+
+# 快照与增量文件中每分钟的字段
+LIVE_FIELDS = ("requests", "bytes", "cached_requests", "status_classes", "waf_mitigated_requests")
+
+live_query = """
+query GetLiveTraffic($zoneTag: String!, $since: DateTime!, $until: DateTime!, $limit: Int!) {
+  viewer {
+    zones(filter: { zoneTag: $zoneTag }) {
+      minutes: httpRequests1mGroups(
+        limit: $limit,
+        filter: { datetime_geq: $since, datetime_lt: $until },
+        orderBy: [datetimeMinute_ASC]
+      ) {
+        dimensions {
+          datetimeMinute
+        }
+        sum {
+          requests
+          bytes
+          cachedRequests
+          responseStatusMap {
+            edgeResponseStatus
+            requests
+          }
+        }
+      }
+      waf: firewallEventsAdaptiveGroups(
+        limit: $limit,
+        filter: { datetime_geq: $since, datetime_lt: $until, action_in: {actions} },
+        orderBy: [datetimeMinute_ASC]
+      ) {
+        count
+        dimensions {
+          datetimeMinute
+        }
+      }
+    }
+  }
+}
+""".replace("{actions}", json.dumps(WAF_ACTIONS))
+
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def empty_minute():
+    return {
+        "requests": 0,
+        "bytes": 0,
+        "cached_requests": 0,
+        "status_classes": [0] * len(STATUS_CLASSES),
+        "waf_mitigated_requests": 0,
+    }
+
+
+def minute_rows(zone):
+    """把一次 GetLiveTraffic 查询的 Zone 数据解析为 {分钟起始时间戳: 字段}。"""
+    rows = {}
+    for group in zone.get("minutes") or []:
+        totals = group["sum"]
+        row = rows.setdefault(parse_minute(group["dimensions"]["datetimeMinute"]), empty_minute())
+        row["requests"] = totals["requests"]
+        row["bytes"] = totals["bytes"]
+        row["cached_requests"] = totals.get("cachedRequests", 0)
+        row["status_classes"] = status_classes(totals.get("responseStatusMap") or [])
+    for group in zone.get("waf") or []:
+        row = rows.setdefault(parse_minute(group["dimensions"]["datetimeMinute"]), empty_minute())
+        row["waf_mitigated_requests"] += group["count"]
+    return rows
+
+
+class LiveWindow:
+    """最近 size 分钟的滚动窗口。
+
+    每个 Zone 的分钟数据分别保存，同一分钟再次获取时直接覆盖，输出时跨 Zone 求和。
+    cursors 记录每个 Zone 已稳定的分钟，下一次查询从这里开始；查询失败时
+    游标不前进，下次轮询自动补上缺失的分钟。
+    """
+
+    def __init__(self, size=WATCH_WINDOW_MINUTES):
+        self.size = size
+        self.rows = {}
+        self.cursors = {}
+        self.seq = 0
+
+    def window_start(self, now):
+        return (int(now) // 60 - self.size + 1) * 60
+
+    def since(self, zone_id, now):
+        """返回 zone_id 本次需要查询的起始分钟。"""
+        return max(self.cursors.get(zone_id, 0), self.window_start(now))
+
+    def update(self, zone_id, rows, settled):
+        """写入一次查询的结果，返回内容发生变化的分钟；settled 之前的分钟之后不再查询。"""
+        changed = set()
+        for minute, row in rows.items():
+            zones = self.rows.setdefault(minute, {})
+            if zones.get(zone_id) != row:
+                zones[zone_id] = row
+                changed.add(minute)
+        self.cursors[zone_id] = max(self.cursors.get(zone_id, 0), settled)
+        return changed
+
+    def trim(self, now):
+        """丢弃滚动窗口之外的分钟。"""
+        start = self.window_start(now)
+        for minute in [minute for minute in self.rows if minute < start]:
+            del self.rows[minute]
+
+    def columns(self, minutes):
+        columns = {"minute": list(minutes), **{field: [] for field in LIVE_FIELDS}}
+        for minute in minutes:
+            total = empty_minute()
+            for row in self.rows[minute].values():
+                for field in LIVE_FIELDS:
+                    if field == "status_classes":
+                        total[field] = [a + b for a, b in zip(total[field], row[field])]
+                    else:
+                        total[field] += row[field]
+            for field in LIVE_FIELDS:
+                columns[field].append(total[field])
+        return columns
+
+    def flush(self, prefix, changed, now):
+        """序号加一，写出完整快照与只含 changed 分钟的增量文件，返回写入的文件。"""
+        base_seq = self.seq
+        self.seq += 1
+        header = {"generated_at": int(now), "seq": self.seq, "window_start": self.window_start(now)}
+        write_json(f"{prefix}_window.json", {**header, "columns": self.columns(sorted(self.rows))})
+        write_json(f"{prefix}_delta.json", {
+            **header,
+            "base_seq": base_seq,
+            "columns": self.columns(sorted(minute for minute in changed if minute in self.rows)),
+        })
+        return [f"{prefix}_window.json", f"{prefix}_delta.json"]
+
+
+def poll(client, window, zone_ids, now, settle_minutes=WATCH_SETTLE_MINUTES):
+    """并发查询每个 Zone 的增量分钟，返回发生变化的分钟集合。"""
+    until = (int(now) // 60 + 1) * 60
+    settled = (int(now) // 60 - settle_minutes) * 60
+    futures = {
+        zone_id: client.submit(live_query, {
+            "zoneTag": zone_id,
+            "since": format_time(window.since(zone_id, now)),
+            "until": format_time(until),
+            "limit": MINUTE_LIMIT,
+        })
+        for zone_id in zone_ids
+    }
+    changed = set()
+    for zone_id, future in futures.items():
+        try:
+            zone = zone_result(future.result(), "minutes", "waf")
+        except GraphQLRequestError as e:
+            print(f"{zone_id} 查询失败，下次轮询重试: {e}")
+            continue
+        changed |= window.update(zone_id, minute_rows(zone), settled)
+    window.trim(now)
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分钟级实时监控，持续输出供看板轮询的增量文件")
+    parser.add_argument("--once", action="store_true", help="只轮询一次后退出")
+    parser.add_argument("--prefix", default=LIVE_PREFIX, help="输出文件前缀")
+    args = parser.parse_args()
+
+    # 只借用采集器的配置、GraphQL 客户端与 Zone 列表，不运行小时采集
+    try:
+        collector = Collector(**env_settings())
+        interval = env_number('WATCH_INTERVAL', str(WATCH_INTERVAL), float, minimum=1.0)
+        window_minutes = env_number('WATCH_WINDOW_MINUTES', str(WATCH_WINDOW_MINUTES), minimum=1)
+        settle_minutes = env_number('WATCH_SETTLE_MINUTES', str(WATCH_SETTLE_MINUTES), minimum=1)
+    except ConfigError as e:
+        sys.exit(str(e))
+
+    with collector:
+        client = collector.client
+        try:
+            zone_ids = collector.list_zones()
+        except ConfigError as e:
+            sys.exit(str(e))
+        window = LiveWindow(window_minutes)
+        print(f"监控 {len(zone_ids)} 个 Zone，每 {interval:g}s 轮询一次，窗口 {window.size} 分钟")
+        while True:
+            started = time.time()
+            changed = poll(client, window, zone_ids, started, settle_minutes)
+            if changed:
+                window.flush(args.prefix, changed, started)
+            seconds = sum(timing["seconds"] for timing in client.timings)
+            print(f"{format_time(started)} 更新 {len(changed)} 分钟，{len(client.timings)} 个请求 {seconds:.2f}s")
+            # 常驻进程中不累积请求耗时记录
+            client.timings.clear()
+            if args.once:
+                break
+            time.sleep(max(0.0, interval - (time.time() - started)))
+
+
+if __name__ == "__main__":
+    main()